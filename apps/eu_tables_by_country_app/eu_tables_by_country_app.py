@@ -5,6 +5,7 @@ from webapp.app import App
 from typing import Dict, Callable, Any
 
 from lib.eu_tables_by_country.eu_tables_by_country import build_tables
+from lib.eurostat.eurostat_api.retry import DeadlineExceeded
 
 
 class EuTablesByCountryApp(App):
@@ -26,7 +27,13 @@ class EuTablesByCountryApp(App):
             case _:  # else english
                 language_id = "en" 
                 
-        tables = build_tables(language_id)
+        try:
+            tables = build_tables(language_id)
+            status = self.get_translation("status_success")
+        except DeadlineExceeded:
+            # the data could not be loaded, so there are no tables
+            tables = {}
+            status = self.get_translation("status_deadline_exceeded")
 
         zip_buffer = io.BytesIO()
 
@@ -39,7 +46,7 @@ class EuTablesByCountryApp(App):
         zip_buffer.seek(0)
         zip_bytes = zip_buffer.getvalue()
 
-        self.set_output("status", self.get_translation("status_success"))
+        self.set_output("status", status)
         self.set_output("file", zip_bytes)
         
     
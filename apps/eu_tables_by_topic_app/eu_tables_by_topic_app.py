@@ -5,6 +5,7 @@ from webapp.app import App
 from typing import Dict, Callable, Any
 
 from lib.eu_tables_by_topic.eu_tables_by_topic import build_tables
+from lib.eurostat.eurostat_api.retry import DeadlineExceeded
 
 
 class EuTablesByTopicApp(App):
@@ -26,7 +27,13 @@ class EuTablesByTopicApp(App):
             case _:  # else english
                 language_id = "en" 
                 
-        tables = build_tables(language_id)
+        try:
+            tables = build_tables(language_id)
+            status = self.get_translation("status_success")
+        except DeadlineExceeded as exception:
+            # only the tables finished until then are returned
+            tables = exception.partial_results
+            status = self.get_translation("status_deadline_exceeded")
 
         zip_buffer = io.BytesIO()
 
@@ -38,7 +45,7 @@ class EuTablesByTopicApp(App):
         zip_buffer.seek(0)
         zip_bytes = zip_buffer.getvalue()
 
-        self.set_output("status", self.get_translation("status_success"))
+        self.set_output("status", status)
         self.set_output("file", zip_bytes)
         
     
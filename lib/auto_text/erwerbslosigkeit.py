@@ -74,15 +74,10 @@ class ErwerbslosigkeitTextGenerator(EurostatAutoTextGenerator):
         return f"{self._year:04d}-{self._month:02d}"
 
     def _df(self, age: str, unit: str) -> pd.DataFrame:
-        df = self._datasets["data"].data.dataframe
-        df = df[df["geo"].isin(self.GEO)].copy()
-        df["observation"] = df["observation"].astype(float)
-        df = df [
-            (df["time"] == self._time())
-            & (df["age"] == age)
-            & (df["unit"] == unit)
-        ]
-        return df
+        df = self._datasets["data"].data.get_values_at(
+            self._time(), {"age": age, "unit": unit}, exact=True
+        ).reset_index()
+        return df[df["geo"].isin(self.GEO)]
 
     def _get_pairs(
         self, df: pd.DataFrame, n: int | None = None, case: str = "D"
@@ -77,15 +77,20 @@ class DataFormatter:
         """
         Diese Funktion nimmt einen Wert entgegen und gibt ihn formatiert zurück.
         """
-        try:
-            # Wenn der Wert ein float ist oder sich in diesen umwandeln lässt,
-            # wandle ihn in einen float um und multipliziere ihn mit dem
-            # Multiplier
-            value = float(value) * self._multiplier
-        except ValueError:
-            # Ansonsten lässt sich der Wert nicht formatieren und wird
-            # unverändert zurückgegeben.
-            return value
+        if isinstance(value, (int, float)):
+            # Zahlen (auch numpy-Zahlen) werden direkt mit dem Multiplier
+            # multipliziert
+            value = value * self._multiplier
+        else:
+            try:
+                # Wenn sich der Wert in einen float umwandeln lässt,
+                # wandle ihn in einen float um und multipliziere ihn mit dem
+                # Multiplier
+                value = float(value) * self._multiplier
+            except ValueError:
+                # Ansonsten lässt sich der Wert nicht formatieren und wird
+                # unverändert zurückgegeben.
+                return value
             
         # Dieser String gibt vor, wie der Wert zu formatieren ist. Als Dezimal-
         # trenner wird hier zunächst immer ein . und als Tausendertrenner
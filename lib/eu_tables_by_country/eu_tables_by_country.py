@@ -1,15 +1,17 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 import pandas as pd
 from datetime import datetime as dt
+import inspect
 import json
+import math
 import os
-import time
-from requests import ConnectionError
-from itertools import count
 
 from lib.eurostat.eurostat_api.dataset import EurostatDataset
-from lib.eurostat.eurostat_api.filters import TimePeriodFilter, DimensionFilter
+from lib.eurostat.eurostat_api.fetch_planner import FetchPlanner
+from lib.eurostat.eurostat_api.filters import TimePeriodFilter
+from lib.eurostat.eurostat_api.retry import Deadline
 from lib.data_formatter.data_formatter import DataFormatter
+from lib.table_builder.artifact_cache import ARTIFACT_CACHE, ArtifactCache
 from lib.table_builder.table_builder import TableBuilder
 
 
@@ -18,7 +20,8 @@ LANGUAGE: str = 'en'
 MIN_YEAR: str = "1990"
 MIN_FILL_LEVEL: float = 0.5
 
-SLEEP_BETWEEN_REQUESTS: float = 10.0  # s
+MAX_WORKERS: int = 8
+BUILD_DEADLINE: float = 20 * 60.0  # s
 
 EU_COUNTRIES: List[str] = [
     "BE", "BG", "DK", "DE", "EE", "FI",
@@ -44,9 +47,24 @@ CONFIDENTIAL_TEXTS: Dict[str, str] = {
     'en': ". -- Numerical value unknown or confidential"
 }
 
-with open(
-    os.path.join("lib", "eu_tables_by_country", "data", "local_data.json"), 'r', encoding='utf-8'
-) as file:
+DATA_DIRECTORY: str = os.path.join("lib", "eu_tables_by_country", "data")
+LOCAL_DATA_FILENAME: str = os.path.join(DATA_DIRECTORY, "local_data.json")
+
+REGIONS: List[Tuple[str, List[str]]] = [
+    ('eu', EU_COUNTRIES),
+    ('eu_cand', EU_CANDIDATE_COUNTRIES),
+    ('efta', EFTA_COUNTRIES)
+]
+
+# Code all tables depend on. If it changes, the tables are built again
+# instead of being taken from the `ArtifactCache`.
+SOURCE_FILENAMES: List[str] = [
+    __file__,
+    inspect.getfile(TableBuilder),
+    inspect.getfile(DataFormatter)
+]
+
+with open(LOCAL_DATA_FILENAME, 'r', encoding='utf-8') as file:
     content = json.load(file)
     CAPITALS: Dict[str, Dict[str, str]] = content['capitals']
     CURRENCIES: Dict[str, Dict[str, str]] = content['currencies']
@@ -55,37 +73,31 @@ with open(
 
 
 def accumulate_data(
-    dataset_definitions: Dict[str, Dict[str, str | Dict[str, str]]]
+    dataset_definitions: Dict[str, Dict[str, str | Dict[str, str]]],
+    max_workers: int = MAX_WORKERS,
+    deadline: Deadline | None = None,
+    last_updates: Dict[str, dt | None] | None = None
 ) -> Dict[str, EurostatDataset]:
-    data = {}
-
+    # Definitions that request the same dataset with other dimension values
+    # are combined into one request by the `FetchPlanner`. The requests run
+    # in parallel; the transport limits how many go to the same server at
+    # once (`lib.network.transport.MAX_REQUESTS_PER_HOST`). Failed requests
+    # are repeated by the `RetryPolicy` of the datasets, but only until the
+    # `deadline`. `last_updates` are the times of the last update of the
+    # datasets if they were already requested.
+    planner = FetchPlanner(
+        LANGUAGE, last_updates=last_updates, deadline=deadline
+    )
     for data_key, definition in dataset_definitions.items():
-        for _ in count(start=1):
-            try:
-                assert isinstance(definition['dataset_id'], str)
-                dataset = EurostatDataset(definition['dataset_id'], LANGUAGE)
-
-                dimension_filter = DimensionFilter(dataset)
-                assert isinstance(definition['dimension_values'], dict)
-                for key, value in definition['dimension_values'].items():
-                    dimension_filter.add_dimension_value(key, value)
-
-                time_period_filter = TimePeriodFilter(dataset)
-                time_period_filter.add(
-                    TimePeriodFilter.Operators.GREATER_OR_EQUALS, MIN_YEAR
-                )
-
-                dataset.request_data()
-
-                data[data_key] = dataset
-            except ConnectionError:
-                pass
-            else:
-                break
-
-            time.sleep(SLEEP_BETWEEN_REQUESTS)
-
-    return data
+        assert isinstance(definition['dataset_id'], str)
+        assert isinstance(definition['dimension_values'], dict)
+        planner.add(
+            data_key,
+            definition['dataset_id'],
+            definition['dimension_values'],
+            [(TimePeriodFilter.Operators.GREATER_OR_EQUALS, MIN_YEAR)]
+        )
+    return planner.fetch(max_workers)
 
 def build_local_row(
     data: Dict[str, Dict[str, str]],
@@ -159,47 +171,33 @@ def build_row_data(
         assert isinstance(specification['key'], str)
         dataset = data[specification['key']]
         time = dataset.data.get_latest_time_value_with(MIN_FILL_LEVEL, {})
-        df = dataset.data.dataframe
-        df = df[df['time'] == time]
 
         if is_geo_special:
             assert isinstance(specification['special_key'], str)
             special_dataset = data[specification['special_key']]
             special_time = special_dataset.data.get_latest_time_value_with(MIN_FILL_LEVEL, {})
-            if int(time) > int(special_time):
-                time = special_time
-            special_df = special_dataset.data.dataframe
-            special_df = special_df[special_df['time'] == time]
-        else:
-            special_df = pd.DataFrame()
+            time = min(time, special_time)
+
+        observations = dataset.data.get_observations(index[1:], {'time': time})
+        if is_geo_special:
+            special_geo = specification.get('special_geo')
+            observations = [
+                special_dataset.data.get_observation({'geo': geo, 'time': time})
+                if geo == special_geo
+                else observation
+                for geo, observation in zip(index[1:], observations)
+            ]
 
         values = []
-        for geo in index[1:]:
-            try:
-                if is_geo_special and geo == specification.get('special_geo'):
-                    status = special_df[special_df['geo'] == geo]['status'].iat[0]
-                else:
-                    status = df[df['geo'] == geo]['status'].iat[0]
-            except IndexError:
+        for observation in observations:
+            if observation is None:
                 values.append(UNAVAILABLE_TEXTS[LANGUAGE])
                 continue
 
+            status, value = observation
             if 'c' in status:
                 values.append(CONFIDENTIAL_TEXTS[LANGUAGE])
-                continue
-
-            try:
-                if is_geo_special and geo == specification.get('special_geo'):
-                    value = special_df[special_df['geo'] == geo]['observation'].iat[0]
-                else:
-                    value = df[df['geo'] == geo]['observation'].iat[0]
-            except IndexError:
-                values.append(UNAVAILABLE_TEXTS[LANGUAGE])
-                continue
-
-            try:
-                float(value)
-            except ValueError:
+            elif math.isnan(value):
                 values.append(UNAVAILABLE_TEXTS[LANGUAGE])
             else:
                 values.append(formatter.format_value(value))
@@ -220,45 +218,31 @@ def build_row_data(
         else:
             time2 = specification['data'][1]['time']  # type: ignore
 
-        df1 = dataset1.data.dataframe
-        df2 = dataset2.data.dataframe
-        df1 = df1[df1['time'] == time1]
-        df2 = df2[df2['time'] == time2]
+        observations1 = dataset1.data.get_observations(index[1:], {'time': time1})
+        observations2 = dataset2.data.get_observations(index[1:], {'time': time2})
 
         values = []
-        for geo in index[1:]:
-            try:
-                status1 = df1[df1['geo'] == geo]['status'].iat[0]
-                if 'c' in status1:
-                    values.append(CONFIDENTIAL_TEXTS[LANGUAGE])
-                    continue
-            except IndexError:
+        for observation1, observation2 in zip(observations1, observations2):
+            if observation1 is None:
                 values.append(UNAVAILABLE_TEXTS[LANGUAGE])
                 continue
-
-            try:
-                status2= df2[df2['geo'] == geo]['status'].iat[0]
-                if 'c' in status2:
-                    values.append(CONFIDENTIAL_TEXTS[LANGUAGE])
-                    continue
-            except IndexError:
-                values.append(UNAVAILABLE_TEXTS[LANGUAGE])
+            status1, value1 = observation1
+            if 'c' in status1:
+                values.append(CONFIDENTIAL_TEXTS[LANGUAGE])
                 continue
 
-            try:
-                value1 = df1[df1['geo'] == geo]['observation'].iat[0]
-                value2 = df2[df2['geo'] == geo]['observation'].iat[0]
-            except IndexError:
+            if observation2 is None:
                 values.append(UNAVAILABLE_TEXTS[LANGUAGE])
                 continue
+            status2, value2 = observation2
+            if 'c' in status2:
+                values.append(CONFIDENTIAL_TEXTS[LANGUAGE])
+                continue
 
-            try:
-                float(value1)
-                float(value2)
-            except ValueError:
+            if math.isnan(value1) or math.isnan(value2) or value2 == 0:
                 values.append(UNAVAILABLE_TEXTS[LANGUAGE])
             else:
-                value = float(value1) / float(value2)
+                value = value1 / value2
                 values.append(formatter.format_value(value))
 
         return pd.DataFrame(
@@ -325,20 +309,75 @@ def build_table_set(
     return result
 
 
-def build_tables(language: str) -> Dict[str, Dict[str, bytes]]:
-    data_directory = os.path.join("lib", "eu_tables_by_country", "data")
-    definitions_filename = os.path.join(data_directory, "dataset_definitions.json")
-    row_specifications_filename = os.path.join(data_directory, "row_specifications.json")
+def build_tables(
+    language: str,
+    deadline_seconds: float | None = BUILD_DEADLINE,
+    artifact_cache: ArtifactCache | None = None
+) -> Dict[str, Dict[str, bytes]]:
+    # The tables are only built if one of the files, one of the datasets
+    # (according to the dataflow) or the year in the rows with local data
+    # changed since the last build. Otherwise they are taken from the
+    # `artifact_cache`. As all tables need the same data, all of them are
+    # built as soon as one is missing.
+    deadline = Deadline(deadline_seconds)
+    artifact_cache = artifact_cache or ARTIFACT_CACHE
+    definitions_filename = os.path.join(DATA_DIRECTORY, "dataset_definitions.json")
+    row_specifications_filename = os.path.join(DATA_DIRECTORY, "row_specifications.json")
     with open(definitions_filename, 'r') as file:
         definition = json.load(file)
-    data = accumulate_data(definition)
     with open(row_specifications_filename, 'r') as file:
         row_specifications = json.load(file)
-    
-    tables = {}
-    for region_code, country_codes in (('eu', EU_COUNTRIES), ('eu_cand', EU_CANDIDATE_COUNTRIES), ('efta', EFTA_COUNTRIES)):
-        table_filename = os.path.join(data_directory, f"{region_code}_layout.json")
-        localization_filename = os.path.join(data_directory, f"{region_code}_localization.json")
+
+    last_updates = EurostatDataset.request_last_updates(
+        [d['dataset_id'] for d in definition.values()],  # type: ignore
+        LANGUAGE,
+        MAX_WORKERS,
+        deadline=deadline
+    )
+    filenames = [
+        definitions_filename, row_specifications_filename, LOCAL_DATA_FILENAME
+    ] + SOURCE_FILENAMES
+    keys, tables = {}, {}
+    for region_code, country_codes in REGIONS:
+        table_filename = os.path.join(DATA_DIRECTORY, f"{region_code}_layout.json")
+        localization_filename = os.path.join(DATA_DIRECTORY, f"{region_code}_localization.json")
+        keys[region_code] = {
+            country_code: artifact_cache.key(
+                [table_filename, localization_filename] + filenames,
+                last_updates,
+                language=language,
+                data_language=LANGUAGE,
+                country_code=country_code,
+                year=dt.now().year,
+                min_year=MIN_YEAR,
+                min_fill_level=MIN_FILL_LEVEL
+            )
+            for country_code in country_codes
+        }
+        tables[region_code] = {
+            country_code: artifact_cache.get(key)
+            for country_code, key in keys[region_code].items()
+        }
+    if all(
+        table is not None
+        for table_set in tables.values()
+        for table in table_set.values()
+    ):
+        return tables
+
+    data = accumulate_data(
+        definition, deadline=deadline, last_updates=last_updates
+    )
+    # Tables from data older than the dataflow are not stored, as they
+    # would otherwise stay outdated until the next update.
+    is_up_to_date = all(
+        dataset.includes_update(last_updates[dataset.dataset_id])
+        for dataset in data.values()
+    )
+
+    for region_code, country_codes in REGIONS:
+        table_filename = os.path.join(DATA_DIRECTORY, f"{region_code}_layout.json")
+        localization_filename = os.path.join(DATA_DIRECTORY, f"{region_code}_localization.json")
         table_set = build_table_set(
             country_codes=country_codes,
             table_filename=table_filename,
@@ -348,5 +387,8 @@ def build_tables(language: str) -> Dict[str, Dict[str, bytes]]:
             language=language
         )
         tables[region_code] = table_set
-    
-    return tables
\ No newline at end of file
+        if is_up_to_date:
+            for country_code, table in table_set.items():
+                artifact_cache.put(keys[region_code][country_code], table)
+
+    return tables
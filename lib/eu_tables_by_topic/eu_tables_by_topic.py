@@ -1,15 +1,20 @@
 # import warnings
 # warnings.simplefilter(action='ignore')
 
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Tuple
+import datetime as dt
 import pandas as pd
+import inspect
 import json
 import math
 import os
 
 from lib.eurostat.eurostat_api.dataset import EurostatDataset
+from lib.eurostat.eurostat_api.fetch_planner import FetchPlanner
 from lib.eurostat.eurostat_api.filters import TimePeriodFilter, DimensionFilter
+from lib.eurostat.eurostat_api.retry import Deadline, DeadlineExceeded
 from lib.data_formatter.data_formatter import DataFormatter
+from lib.table_builder.artifact_cache import ARTIFACT_CACHE, ArtifactCache
 from lib.table_builder.table_builder import TableBuilder
 
 
@@ -20,6 +25,26 @@ TABLE_DATA_PATH: str = os.path.join("lib", "eu_tables_by_topic", "data")
 MIN_YEAR: str = '1990'
 # Ein Jahr muss 50 % der Daten zu Verfügung stellen, um ausgewählt zu werden
 MIN_FILL_LEVEL: float = 0.5
+# Nach dieser Zeit wird der Bau der Tabellen abgebrochen
+BUILD_DEADLINE: float = 20 * 60.0  # s
+# So viele Anfragen werden gleichzeitig gestellt
+MAX_WORKERS: int = 8
+
+TABLE_IDS: List[str] = [
+    "allgemeines",
+    "arbeitsmarkt",
+    "aussenhandel",
+    "bevoelkerung",
+    "bildung",
+    "gesundheit",
+    "industrie",
+    "landwirtschaft",
+    "soziales",
+    "umwelt",
+    "verkehr",
+    "wirtschaft",
+    "wissenschaft"
+]
 
 # Texte, die angezeigt werden, wenn keine Daten vorhanden sind
 UNAVAILABLE_TEXTS: Dict[str, str] = {
@@ -33,14 +58,72 @@ CONFIDENTIAL_TEXTS: Dict[str, str] = {
     'en': ". -- Numerical value unknown or confidential"
 }
 
+# Dateien, von denen alle Tabellen abhängen. Ändert sich eine davon, werden
+# die Tabellen neu gebaut, statt sie aus dem `ArtifactCache` zu nehmen.
+SHARED_FILENAMES: List[str] = [
+    os.path.join(TABLE_DATA_PATH, "country_order.json"),
+    os.path.join(TABLE_DATA_PATH, "country_names.json"),
+    __file__,
+    inspect.getfile(TableBuilder),
+    inspect.getfile(DataFormatter)
+]
+
 # Lesen von Staatennamen und der Anzeigereihenfolge der Staaten aus Dateien
 with open(os.path.join(TABLE_DATA_PATH, "country_order.json"), 'r') as file:
   COUNTRY_ORDER = json.load(file)
 with open(os.path.join(TABLE_DATA_PATH, "country_names.json"), 'r') as file:
   COUNTRY_NAMES = json.load(file)
 
+def slice_key(dataset_id: str, dimension_values: Dict[str, str]) -> str:
+    return json.dumps([dataset_id, dimension_values], sort_keys=True)
+
+
+def accumulate_data(
+    column_specifications: List[Dict[str, Dict[str, Any]]],
+    language: str,
+    deadline: Deadline | None = None,
+    last_updates: Dict[str, dt.datetime | None] | None = None
+) -> Dict[str, EurostatDataset]:
+    """
+    Lädt alle Daten, die für die angegebenen Spaltenspezifikationen
+    gebraucht werden. Gleiche Abfragen werden nur einmal gestellt und
+    Abfragen desselben Datensatzes mit unterschiedlichen Dimensionswerten
+    vom `FetchPlanner` zu einer Anfrage zusammengefasst. Zwischengespeicherte
+    Daten, die älter sind als die Aktualisierungszeiten `last_updates`,
+    werden aktualisiert.
+
+    Das Ergebnis enthält die Datensätze unter dem Schlüssel `slice_key`.
+    """
+    planner = FetchPlanner(
+        language, last_updates=last_updates, deadline=deadline
+    )
+    keys = set()
+    for specifications in column_specifications:
+        for column_specification in specifications.values():
+            for specification in column_specification.get(
+                'specifications', [column_specification]
+            ):
+                key = slice_key(
+                    specification['dataset_id'],
+                    specification['dimension_values']
+                )
+                if key in keys:
+                    continue
+                keys.add(key)
+                planner.add(
+                    key,
+                    specification['dataset_id'],
+                    specification['dimension_values'],
+                    [(TimePeriodFilter.Operators.GREATER_OR_EQUALS, MIN_YEAR)]
+                )
+    return planner.fetch(MAX_WORKERS)
+
+
 def parse_specification(
-    column_specification: Dict[str, Any], language: str
+    column_specification: Dict[str, Any],
+    language: str,
+    deadline: Deadline | None = None,
+    datasets: Dict[str, EurostatDataset] | None = None
 ) -> Tuple[pd.DataFrame, str]:
     if column_specification.get('is_ratio', False):
         specifications = column_specification['specifications']
@@ -48,7 +131,9 @@ def parse_specification(
             dataset_id=specifications[0]['dataset_id'],
             dimension_values=specifications[0]['dimension_values'],
             time=specifications[0].get('time', None),
-            language=language
+            language=language,
+            deadline=deadline,
+            datasets=datasets
         )
 
         time2 = specifications[1].get('time', None)
@@ -59,14 +144,14 @@ def parse_specification(
             dataset_id=specifications[1]['dataset_id'],
             dimension_values=specifications[1]['dimension_values'],
             time=time2,
-            language=language
+            language=language,
+            deadline=deadline,
+            datasets=datasets
         )
 
-        df1 = ds1.data.dataframe
-        df2 = ds2.data.dataframe
-        df1 = df1[df1['time'] == time1]
-        df2 = df2[df2['time'] == time2]
-        df = build_ratio_dataframe(df1, df2, ds1)
+        df1 = ds1.data.get_values_at(time1, exact=True).reset_index()
+        df2 = ds2.data.get_values_at(time2, exact=True).reset_index()
+        df = build_ratio_dataframe(df1, df2)
         time = max(time1, time2)
 
     else:
@@ -74,11 +159,12 @@ def parse_specification(
             dataset_id=column_specification['dataset_id'],
             dimension_values=column_specification['dimension_values'],
             time=column_specification.get('time', None),
-            language=language
+            language=language,
+            deadline=deadline,
+            datasets=datasets
         )
 
-        df = ds.data.dataframe
-        df = df[df['time'] == time]
+        df = ds.data.get_values_at(time, exact=True).reset_index()
 
     return df, time
 
@@ -86,21 +172,29 @@ def prepare_dataframe(
     dataset_id: str,
     dimension_values: Dict[str, str],
     time: str | None,
-    language: str
+    language: str,
+    deadline: Deadline | None = None,
+    datasets: Dict[str, EurostatDataset] | None = None
 ) -> Tuple[EurostatDataset, str]:
-    dataset = EurostatDataset(
-        dataset_id=dataset_id,
-        language=language
-    )
+    data_key = slice_key(dataset_id, dimension_values)
+    if datasets is not None and data_key in datasets:
+        # Der Datensatz wurde bereits von `accumulate_data` geladen
+        dataset = datasets[data_key]
+    else:
+        dataset = EurostatDataset(
+            dataset_id=dataset_id,
+            language=language,
+            deadline=deadline
+        )
 
-    dimension_filter = DimensionFilter(dataset)
-    for key, value in dimension_values.items():
-      dimension_filter.add_dimension_value(key, value)
+        dimension_filter = DimensionFilter(dataset)
+        for key, value in dimension_values.items():
+          dimension_filter.add_dimension_value(key, value)
 
-    time_period_filter = TimePeriodFilter(dataset)
-    time_period_filter.add(TimePeriodFilter.Operators.GREATER_OR_EQUALS, MIN_YEAR)
+        time_period_filter = TimePeriodFilter(dataset)
+        time_period_filter.add(TimePeriodFilter.Operators.GREATER_OR_EQUALS, MIN_YEAR)
 
-    dataset.request_data()
+        dataset.request_data()
 
     latest_time = dataset.data.get_latest_time_value_with(MIN_FILL_LEVEL, {})
     time = latest_time if time is None else time
@@ -108,15 +202,6 @@ def prepare_dataframe(
     return dataset, time
 
 
-def compute_ratio(row, dataset: EurostatDataset) -> float | str:
-    value1 = row['observation_1']
-    value2 = row['observation_2']
-    try:
-        return float(value1) / float(value2)
-    except (ValueError, ZeroDivisionError, TypeError):
-        return EurostatDataset.none_value  # type: ignore
-
-
 def merge_status(row) -> str:
     status1 = row['status_1'] if isinstance(row['status_1'], str) else ""
     status2 = row['status_2'] if isinstance(row['status_2'], str) else ""
@@ -125,8 +210,7 @@ def merge_status(row) -> str:
 
 def build_ratio_dataframe(
     df1: pd.DataFrame,
-    df2: pd.DataFrame,
-    dataset: EurostatDataset
+    df2: pd.DataFrame
 ) -> pd.DataFrame:
     df = pd.merge(
         df1,
@@ -136,7 +220,10 @@ def build_ratio_dataframe(
         how='outer',
         suffixes=("_1", "_2")
     )
-    df['observation'] = df.apply(compute_ratio, axis=1, args=(dataset,))
+    # Fehlende Werte und Divisionen durch 0 ergeben NaN
+    df['observation'] = (
+        df['observation_1'] / df['observation_2'].where(df['observation_2'] != 0)
+    )
     df['status'] = df.apply(merge_status, axis=1)
     df['time'] = df.apply(lambda r: max(str(r['time_1']), str(r['time_2'])), axis=1)
     return df
@@ -181,15 +268,10 @@ def format_unavailable_row(row, key: str, status_key: str, language: str) -> str
     if 'c' in status:
         return CONFIDENTIAL_TEXTS[language]
     else:
-        try:
-            v = float(value)
-        except ValueError:
+        if math.isnan(value):
             return UNAVAILABLE_TEXTS[language]
         else:
-            if math.isnan(v):
-                return UNAVAILABLE_TEXTS[language]
-            else:
-                return value
+            return value
 
 
 def format_dataframe(
@@ -220,7 +302,9 @@ def build_table(
     table_filename: str,
     localization_filename: str,
     column_specifications: Dict[str, Dict[str, Any]],
-    language: str
+    language: str,
+    deadline: Deadline | None = None,
+    datasets: Dict[str, EurostatDataset] | None = None
 ) -> bytes:
     """
     Nimmt eine Spaltenspezifikation und drei Dateinamen entgegen.
@@ -237,6 +321,12 @@ def build_table(
     `output_filename` ist der Pfad zu der xlsx-Datei, welche die
     fertige Tabelle enthält.
 
+    `deadline` begrenzt die Zeit, die für das Herunterladen der Daten
+    inklusive aller Wiederholungsversuche zur Verfügung steht.
+
+    `datasets` kann die mit `accumulate_data` vorab geladenen Datensätze
+    enthalten. Fehlende Datensätze werden einzeln heruntergeladen.
+
     Nachdem die Funktion ausgeführt wurde, wurde eine xlsx-Datei erstellt,
     die die Tabelle enthält.
     """
@@ -251,14 +341,16 @@ def build_table(
     #   1. die Daten von Eurostat herunter geladen (`df`) und die späteste
     #      Zeit mit mindestens `MIN_FILL_LEVEL` einträgen (`time`) bestimmt.
     #   2. alle unnötigen Spalten (alle außer 'geo', 'observation', 'status')
-    #      entfernt
+    #      entfernt und die Staaten als Text gespeichert
     #   3. die einzelnen DataFrames unter dem in der Speifikation angegebenen
     #      Schlüssel abgelegt
     #   4. die Zeit (`time`) den Variablen hinzugefügt, sodass sie in der
     #      Tabelle angezeigt werden kann.
     for column_key, column_specification in column_specifications.items():
-        df, time = parse_specification(column_specification, language)
-        df = df[['geo', 'observation', 'status']]
+        df, time = parse_specification(
+            column_specification, language, deadline, datasets
+        )
+        df = df[['geo', 'observation', 'status']].astype({'geo': str})
         dataframes[column_key] = df
         variables[f"{column_key}_time"] = time
 
@@ -284,32 +376,111 @@ def build_table(
     )
 
 
+def table_filenames(table_id: str) -> Tuple[str, str, str]:
+    layout_filename = os.path.join(TABLE_DATA_PATH, f"{table_id}_layout.json")
+    localization_filename = os.path.join(TABLE_DATA_PATH, f"{table_id}_localization.json")
+    specification_filename = os.path.join(TABLE_DATA_PATH, f"{table_id}_specification.json")
+    return layout_filename, localization_filename, specification_filename
+
+
 def create_build_table_params(table_id: str, language: str) -> Tuple[str, str, Dict[str, Dict[str, Any]], str]:
-    data_directory = os.path.join("lib", "eu_tables_by_topic", "data")
-    layout_filename = os.path.join(data_directory, f"{table_id}_layout.json")
-    localization_filename = os.path.join(data_directory, f"{table_id}_localization.json")
-    specification_filename = os.path.join(data_directory, f"{table_id}_specification.json")
+    layout_filename, localization_filename, specification_filename = table_filenames(table_id)
     with open(specification_filename, 'r') as file:
         specification = json.load(file)
     return layout_filename, localization_filename, specification, language
 
 
-def build_tables(language: str) -> Dict[str, bytes]:
-    return {
-        table_id: build_table(*create_build_table_params(table_id, language))
-        for table_id in [
-            "allgemeines",
-            "arbeitsmarkt",
-            "aussenhandel",
-            "bevoelkerung",
-            "bildung",
-            "gesundheit",
-            "industrie",
-            "landwirtschaft",
-            "soziales",
-            "umwelt",
-            "verkehr",
-            "wirtschaft",
-            "wissenschaft"
-        ]
-    }
\ No newline at end of file
+def collect_dataset_ids(column_specifications: Dict[str, Dict[str, Any]]) -> List[str]:
+    return sorted({
+        specification['dataset_id']
+        for column_specification in column_specifications.values()
+        for specification in column_specification.get(
+            'specifications', [column_specification]
+        )
+    })
+
+
+def build_tables(
+    language: str,
+    deadline_seconds: float | None = BUILD_DEADLINE,
+    artifact_cache: ArtifactCache | None = None
+) -> Dict[str, bytes]:
+    """
+    Baut alle Tabellen in der Sprache `language`.
+
+    Eine Tabelle wird nur gebaut, wenn sich seit dem letzten Bau eine ihrer
+    Dateien oder einer ihrer Datensätze geändert hat. Sonst wird sie aus dem
+    `artifact_cache` genommen. Ob sich ein Datensatz geändert hat, ergibt
+    sich aus dem Zeitpunkt der letzten Aktualisierung im Dataflow.
+
+    Läuft die Zeit ab, wird `DeadlineExceeded` mit den bis dahin fertigen
+    Tabellen ausgelöst.
+    """
+    deadline = Deadline(deadline_seconds)
+    artifact_cache = artifact_cache or ARTIFACT_CACHE
+    params = {
+        table_id: create_build_table_params(table_id, language)
+        for table_id in TABLE_IDS
+    }
+    dataset_ids = {
+        table_id: collect_dataset_ids(specification)
+        for table_id, (_, _, specification, _) in params.items()
+    }
+    last_updates = EurostatDataset.request_last_updates(
+        [dataset_id for ids in dataset_ids.values() for dataset_id in ids],
+        language,
+        MAX_WORKERS,
+        deadline=deadline
+    )
+    keys = {
+        table_id: artifact_cache.key(
+            list(table_filenames(table_id)) + SHARED_FILENAMES,
+            {dataset_id: last_updates[dataset_id] for dataset_id in dataset_ids[table_id]},
+            language=language,
+            min_year=MIN_YEAR,
+            min_fill_level=MIN_FILL_LEVEL
+        )
+        for table_id in TABLE_IDS
+    }
+    tables = {
+        table_id: artifact_cache.get(keys[table_id])
+        for table_id in TABLE_IDS
+    }
+    missing_table_ids = [
+        table_id for table_id, table in tables.items() if table is None
+    ]
+    if not missing_table_ids:
+        return tables
+
+    try:
+        # Zuerst werden die Daten für alle fehlenden Tabellen gemeinsam
+        # geladen
+        datasets = accumulate_data(
+            [params[table_id][2] for table_id in missing_table_ids],
+            language,
+            deadline,
+            last_updates
+        )
+        # Tabellen aus Daten, die älter sind als der Dataflow, werden nicht
+        # gespeichert, da sie sonst bis zur nächsten Aktualisierung veraltet
+        # blieben.
+        is_up_to_date = all(
+            dataset.includes_update(last_updates[dataset.dataset_id])
+            for dataset in datasets.values()
+        )
+        for table_id in missing_table_ids:
+            tables[table_id] = build_table(*params[table_id], deadline, datasets)
+            if is_up_to_date:
+                artifact_cache.put(keys[table_id], tables[table_id])
+    except DeadlineExceeded as exception:
+        # Die bis dahin fertigen Tabellen werden mit der Ausnahme übergeben
+        finished_tables = {
+            table_id: table
+            for table_id, table in tables.items()
+            if table is not None
+        }
+        raise DeadlineExceeded(
+            f"Deadline exceeded after building {len(finished_tables)} tables!",
+            finished_tables
+        ) from exception
+    return tables
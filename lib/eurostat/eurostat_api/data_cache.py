@@ -0,0 +1,375 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+from lib.eurostat.eurostat_api.filters import TimePeriodFilter
+from lib.eurostat.eurostat_api.sdmx_data import SdmxData
+
+
+class DataQuery:
+
+    # The filters of a data request: the requested values per dimension (all
+    # values of the other dimensions) and the conditions on the time periods.
+
+    Operators = TimePeriodFilter.Operators
+
+    dimension_values: Dict[str, List[str]]
+    time_periods: List[Tuple[str, str]]
+
+    def __init__(
+        self,
+        dimension_values: Dict[str, List[str]],
+        time_periods: List[Tuple[str, str]]
+    ):
+        self.dimension_values = {
+            dimension_id: sorted(set(values))
+            for dimension_id, values in dimension_values.items()
+        }
+        self.time_periods = sorted(set(
+            (operator, time_period) for operator, time_period in time_periods
+        ))
+
+    @classmethod
+    def _matches(cls, period: str, operator: str, time_period: str) -> bool:
+        # Like Eurostat, a year also stands for all its months, quarters...
+        # e.g. "2020-05" is lower or equal to "2020".
+        if operator == cls.Operators.GREATER_OR_EQUALS:
+            return period >= time_period
+        if operator == cls.Operators.GREATER:
+            return period > time_period and not period.startswith(time_period)
+        if operator == cls.Operators.LOWER_OR_EQUALS:
+            return period <= time_period or period.startswith(time_period)
+        if operator == cls.Operators.LOWER:
+            return period < time_period
+        return period.startswith(time_period)
+
+    @classmethod
+    def _implies(
+        cls, condition: Tuple[str, str], other_condition: Tuple[str, str]
+    ) -> bool:
+        # Whether all periods that meet `condition` meet `other_condition`
+        if condition == other_condition:
+            return True
+        operator, time_period = condition
+        other_operator, other_time_period = other_condition
+        if other_operator == cls.Operators.GREATER_OR_EQUALS:
+            return (
+                operator in (cls.Operators.GREATER_OR_EQUALS, cls.Operators.EQUALS)
+                and time_period >= other_time_period
+            )
+        if other_operator == cls.Operators.LOWER_OR_EQUALS:
+            return (
+                operator in (cls.Operators.LOWER_OR_EQUALS, cls.Operators.EQUALS)
+                and len(time_period) >= len(other_time_period)
+                and time_period[:len(other_time_period)] <= other_time_period
+            )
+        return False
+
+    def contains(self, query: 'DataQuery') -> bool:
+        # Whether the data of this query includes all data of `query`
+        for dimension_id, values in self.dimension_values.items():
+            if dimension_id not in query.dimension_values:
+                return False
+            if not set(query.dimension_values[dimension_id]) <= set(values):
+                return False
+        return all(
+            any(
+                self._implies(condition, other_condition)
+                for condition in query.time_periods
+            )
+            for other_condition in self.time_periods
+        )
+
+    def restrict(self, data: SdmxData) -> SdmxData:
+        # The part of `data` (the answer to a containing query) that answers
+        # this query
+        dimension_values: Dict[str, List[str]] = dict(self.dimension_values)
+        if self.time_periods:
+            dimension_values['time'] = [
+                period for period in data.periods
+                if all(
+                    self._matches(period, operator, time_period)
+                    for operator, time_period in self.time_periods
+                )
+            ]
+        return data.select(dimension_values)
+
+    @property
+    def json_data(self) -> Dict[str, Any]:
+        return {
+            'dimension_values': self.dimension_values,
+            'time_periods': self.time_periods
+        }
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, DataQuery)
+            and self.json_data == other.json_data
+        )
+
+
+class DataCache:
+
+    # Parsed data of earlier requests together with the query behind it.
+    # A request is answered locally if a cached query contains it. Entries
+    # older than `ttl` are kept up to `max_age` as a base for incremental
+    # updates (see `EurostatDataset.refresh`). `downloaded_at` is the time
+    # of the last full download of an entry's data, which incremental
+    # updates keep. At most `max_entries` entries are held in memory, the
+    # least recently used datasets are read from the directory again (and
+    # are lost without a directory).
+
+    DEFAULT_DIRECTORY: str = os.path.join(".cache", "data")
+    DEFAULT_TTL: float = 24 * 60 * 60.0  # s
+    DEFAULT_MAX_AGE: float = 62 * 24 * 60 * 60.0  # s
+    DEFAULT_MAX_ENTRIES: int = 256
+
+    class Entry:
+
+        query: DataQuery
+        stored_at: float
+        data: SdmxData
+        downloaded_at: float
+
+        def __init__(
+            self,
+            query: DataQuery,
+            stored_at: float,
+            data: SdmxData,
+            downloaded_at: float | None = None
+        ):
+            self.query = query
+            self.stored_at = stored_at
+            self.data = data
+            self.downloaded_at = (
+                stored_at if downloaded_at is None else downloaded_at
+            )
+
+    _directory: str | None
+    _ttl: float
+    _max_age: float
+    _max_entries: int
+    # In the order of use, the least recently used first
+    _entries: Dict[Tuple[str, ...], List[Entry]]
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        directory: str | None = DEFAULT_DIRECTORY,
+        ttl: float = DEFAULT_TTL,
+        max_age: float = DEFAULT_MAX_AGE,
+        max_entries: int = DEFAULT_MAX_ENTRIES
+    ):
+        assert max_entries >= 1, "max_entries must be at least 1!"
+
+        self._directory = directory
+        self._ttl = ttl
+        self._max_age = max(ttl, max_age)
+        self._max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(
+        dataset_id: str, language: str, data_format: str, none_value: Any
+    ) -> Tuple[str, ...]:
+        return (dataset_id, language, data_format, json.dumps(none_value))
+
+    def _filename(self, key: Tuple[str, ...], query: DataQuery) -> str:
+        assert self._directory is not None
+        dataset_id, language, data_format, _ = key
+        digest = hashlib.sha1(
+            json.dumps([key, query.json_data]).encode('utf-8')
+        ).hexdigest()
+        return os.path.join(
+            self._directory,
+            f"{dataset_id}.{language}.{data_format}.{digest}"
+        )
+
+    def _is_fresh(self, stored_at: float) -> bool:
+        return time.time() - stored_at < self._ttl
+
+    def _is_kept(self, stored_at: float) -> bool:
+        return time.time() - stored_at < self._max_age
+
+    def _read(self, key: Tuple[str, ...]) -> List[Entry]:
+        # The entries stored by earlier runs. Each entry is a snapshot of the
+        # data and a json file with the query.
+        if self._directory is None or not os.path.isdir(self._directory):
+            return []
+        dataset_id, language, data_format, none_value = key
+        prefix = f"{dataset_id}.{language}.{data_format}."
+        entries = []
+        for name in os.listdir(self._directory):
+            if not (name.startswith(prefix) and name.endswith('.json')):
+                continue
+            filename = os.path.join(self._directory, name[:-len('.json')])
+            try:
+                with open(f"{filename}.json", 'r', encoding='utf-8') as file:
+                    content = json.load(file)
+                if content['none_value'] != none_value:
+                    continue
+                if not self._is_kept(content['stored_at']):
+                    continue
+                data = SdmxData.load(f"{filename}.arrow")
+            except (FileNotFoundError, json.JSONDecodeError, OSError):
+                continue
+            query = DataQuery(
+                content['query']['dimension_values'],
+                [tuple(condition) for condition in content['query']['time_periods']]
+            )
+            entries.append(self.Entry(
+                query,
+                content['stored_at'],
+                data,
+                content.get('downloaded_at')
+            ))
+        return entries
+
+    def _write(self, key: Tuple[str, ...], entry: Entry):
+        if self._directory is None:
+            return
+        # The directory is only created when something is stored, not
+        # already when the module is imported
+        os.makedirs(self._directory, exist_ok=True)
+        filename = self._filename(key, entry.query)
+        entry.data.save(f"{filename}.arrow")
+        temporary_filename = f"{filename}.{threading.get_ident()}.tmp"
+        with open(temporary_filename, 'w', encoding='utf-8') as file:
+            json.dump({
+                'stored_at': entry.stored_at,
+                'downloaded_at': entry.downloaded_at,
+                'none_value': key[3],
+                'query': entry.query.json_data
+            }, file)
+        os.replace(temporary_filename, f"{filename}.json")
+
+    def _remove(self, key: Tuple[str, ...], entry: Entry):
+        if self._directory is None:
+            return
+        filename = self._filename(key, entry.query)
+        for extension in ('json', 'arrow'):
+            try:
+                os.remove(f"{filename}.{extension}")
+            except FileNotFoundError:
+                pass
+
+    def _get_entries(self, key: Tuple[str, ...]) -> List[Entry]:
+        # Reinserted, so that the most recently used key comes last
+        if key in self._entries:
+            entries = self._entries.pop(key)
+        else:
+            entries = self._read(key)
+        self._entries[key] = [
+            entry for entry in entries
+            if self._is_kept(entry.stored_at)
+        ]
+        self._evict(key)
+        return self._entries[key]
+
+    def _evict(self, key: Tuple[str, ...]):
+        # Only the entries in memory are dropped, not the files. The entries
+        # of `key` are kept, even if there are more than `max_entries`.
+        count = sum(len(entries) for entries in self._entries.values())
+        for other in list(self._entries):
+            if count <= self._max_entries:
+                break
+            if other != key:
+                count -= len(self._entries.pop(other))
+
+    def _find(
+        self, key: Tuple[str, ...], query: DataQuery, fresh: bool
+    ) -> Entry | None:
+        # The newest entry whose query contains `query`
+        with self._lock:
+            entries = [
+                entry for entry in self._get_entries(key)
+                if (not fresh or self._is_fresh(entry.stored_at))
+                and entry.query.contains(query)
+                and all(
+                    dimension_id in entry.data.dimension_ids
+                    for dimension_id in query.dimension_values
+                )
+            ]
+        if not entries:
+            return None
+        return max(entries, key=lambda entry: entry.stored_at)
+
+    def get_entry(
+        self,
+        dataset_id: str,
+        language: str,
+        data_format: str,
+        none_value: Any,
+        query: DataQuery,
+        include_outdated: bool = False
+    ) -> Entry | None:
+        # With `include_outdated` entries older than `ttl` are used, too. The
+        # data might be outdated then and is meant to be updated
+        # incrementally.
+        key = self._key(dataset_id, language, data_format, none_value)
+        entry = self._find(key, query, fresh=not include_outdated)
+        if entry is None or entry.query == query:
+            return entry
+        return self.Entry(
+            query, entry.stored_at, query.restrict(entry.data),
+            entry.downloaded_at
+        )
+
+    def get(
+        self,
+        dataset_id: str,
+        language: str,
+        data_format: str,
+        none_value: Any,
+        query: DataQuery,
+        include_outdated: bool = False
+    ) -> SdmxData | None:
+        entry = self.get_entry(
+            dataset_id, language, data_format, none_value, query,
+            include_outdated
+        )
+        return None if entry is None else entry.data
+
+    def put(
+        self,
+        dataset_id: str,
+        language: str,
+        data_format: str,
+        none_value: Any,
+        query: DataQuery,
+        data: SdmxData,
+        downloaded_at: float | None = None
+    ):
+        # `downloaded_at` defaults to now, i.e. `data` was just downloaded
+        key = self._key(dataset_id, language, data_format, none_value)
+        entry = self.Entry(query, time.time(), data, downloaded_at)
+        with self._lock:
+            # Entries contained in the new one are not needed anymore
+            entries = self._get_entries(key)
+            self._entries[key] = [
+                other for other in entries
+                if not query.contains(other.query)
+            ] + [entry]
+            self._evict(key)
+            for other in entries:
+                if query.contains(other.query) and other.query != query:
+                    self._remove(key, other)
+        self._write(key, entry)
+
+    @property
+    def max_age(self) -> float:
+        return self._max_age
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._directory is not None and os.path.isdir(self._directory):
+            for name in os.listdir(self._directory):
+                os.remove(os.path.join(self._directory, name))
+
+
+DATA_CACHE: DataCache = DataCache()
@@ -1,10 +1,23 @@
+import copy
+import datetime as dt
+import email.utils
 import json
-from typing import Any, Dict, List
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
 
-import lib.eurostat.eurostat_api.request as request
+import requests
+
+from lib.eurostat.eurostat_api.data_cache import DATA_CACHE, DataCache, DataQuery
 from lib.eurostat.eurostat_api.datastructure_definition import DatastructureDefinition
 from lib.eurostat.eurostat_api.filters import DimensionFilter, Filter, TimePeriodFilter
+from lib.eurostat.eurostat_api.metadata_cache import METADATA_CACHE, MetadataCache
+from lib.eurostat.eurostat_api.retry import DEFAULT_RETRY_POLICY, Deadline, RetryPolicy
+from lib.eurostat.eurostat_api.sdmx_csv import read_sdmx_csv
 from lib.eurostat.eurostat_api.sdmx_data import SdmxData
+from lib.eurostat.eurostat_api.sdmx_json_stream import SdmxJsonStreamParser
+from lib.network.http_cache import get_cached_transport
 
 
 class EurostatDataset:
@@ -16,18 +29,47 @@ class EurostatDataset:
     DSD_BASE_URL: str = f"{BASE_URL}/structure/datastructure/ESTAT"
     DATA_BASE_URL: str = f"{BASE_URL}/data/dataflow/ESTAT"
 
+    STREAM_CHUNK_SIZE: int = 64 * 1024  # bytes
+
+    class Formats:
+        JSON: str = 'json'
+        CSV: str = 'csv'
+
+    class RequestTypes:
+        METADATA: str = 'metadata'
+        DATASTRUCTURE_DEFINITION: str = 'datastructure_definition'
+        DATA: str = 'data'
+
+    class Compressions:
+        # Transferred uncompressed
+        NONE: str = 'none'
+        # With `Accept-Encoding: gzip`, decompressed by requests
+        HTTP: str = 'http'
+        # With `compress=true`, Eurostat then sends a gzip file (or a zlib
+        # stream) that is decompressed piecewise while it is read
+        EUROSTAT: str = 'eurostat'
+
+    DEFAULT_COMPRESSIONS: Dict[str, str] = {
+        RequestTypes.METADATA: Compressions.HTTP,
+        RequestTypes.DATASTRUCTURE_DEFINITION: Compressions.HTTP,
+        RequestTypes.DATA: Compressions.EUROSTAT
+    }
+
+    GZIP_MAGIC_NUMBER: bytes = b'\x1f\x8b'
+
+    # Annotation of the dataflow with the time of the last data update
+    UPDATE_ANNOTATION_TYPE: str = 'UPDATE_DATA'
+
     @classmethod
     def from_json_file(cls, json_filename: str):
         with open(json_filename, 'r') as file:
             json_data = json.load(file)
-        if 'none_value' in json_data:
-            dataset = cls(
-                json_data['dataset'],
-                json_data['language'],
-                json_data['none_value']
-            )
-        else:
-            dataset = cls(json_data['dataset'], json_data['language'])
+        kwargs = {
+            key: json_data[key]
+            for key in ('none_value', 'data_format', 'compressions')
+            if key in json_data
+        }
+        dataset = cls(json_data['dataset'], json_data['language'], **kwargs)
         if 'dimension_filter' in json_data:
             dimension_filter = DimensionFilter(dataset)
             for dimension_id, values in json_data['dimension_filter'].items():
@@ -45,79 +87,456 @@ class EurostatDataset:
     _dataset_id: str
     _language: str
     _none_value: Any
-    _version: str
-    _datastructure_definition: DatastructureDefinition
+    _version: str | None
+    _datastructure_definition: DatastructureDefinition | None
     _filters: List[Filter]
-    _data: SdmxData
+    _data: SdmxData | None
+    # Time of the last full download of `_data`
+    _downloaded_at: float | None
+    _retry_policy: RetryPolicy
+    _deadline: Deadline | None
+    _metadata_cache: MetadataCache
+    _data_cache: DataCache
+    _data_format: str
+    _compressions: Dict[str, str]
 
     def __init__(
-        self, dataset_id: str, language: str, none_value: Any = "-"
+        self,
+        dataset_id: str,
+        language: str,
+        none_value: Any = "-",
+        retry_policy: RetryPolicy | None = None,
+        deadline: Deadline | None = None,
+        metadata_cache: MetadataCache | None = None,
+        defer_metadata: bool = True,
+        data_format: str = Formats.JSON,
+        compressions: Dict[str, str] | None = None,
+        data_cache: DataCache | None = None
     ):
         assert isinstance(dataset_id, str), "dataset_id must be a string!"
+        assert data_format in (self.Formats.JSON, self.Formats.CSV), \
+            f"Unknown data format: {data_format}!"
 
         self._dataset_id = dataset_id
         self._language = language
         self._none_value = none_value
         self._filters = []
-        self._request_version()
-        self._request_datastructure_definition()
+        self._retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+        self._deadline = deadline
+        self._metadata_cache = metadata_cache or METADATA_CACHE
+        self._data_cache = data_cache or DATA_CACHE
+        self._data_format = data_format
+        self._compressions = {
+            **self.DEFAULT_COMPRESSIONS,
+            **(compressions or {})
+        }
+        for request_type, compression in self._compressions.items():
+            assert compression in (
+                self.Compressions.NONE,
+                self.Compressions.HTTP,
+                self.Compressions.EUROSTAT
+            ), f"Unknown compression for {request_type}: {compression}!"
+        self._version = None
+        self._datastructure_definition = None
+        self._data = None
+        self._downloaded_at = None
+        # The version and the datastructure definition are only needed for
+        # `dimension_ids`, so by default they are loaded on first access.
+        if not defer_metadata:
+            self._request_version()
+            self._request_datastructure_definition()
 
-    def _request_version(self):
-        response = request.get(
-            url=f"{self.METADATA_BASE_URL}/{self._dataset_id}/1.0",
+    def _get(
+        self,
+        url: str,
+        params: Dict[str, str],
+        request_type: str,
+        read: Callable[[requests.Response], Any] | None = None,
+        max_age: float | None = None
+    ) -> Any:
+        # Data is streamed: `read` gets the unread response and parses it
+        # while it is downloaded. Without `read` the response is returned.
+        def read_response(response: requests.Response) -> Any:
+            try:
+                response.raise_for_status()
+                return response if read is None else read(response)
+            finally:
+                if read is not None:
+                    response.close()
+
+        compression = self._compressions[request_type]
+        return self._retry_policy.get(
+            get_cached_transport().get,
+            url=url,
+            deadline=self._deadline,
+            read=read_response,
+            stream=request_type == self.RequestTypes.DATA,
+            max_age=max_age,
             params={
-                'compress': 'false',
-                'format': 'json'
+                **params,
+                'compress': (
+                    'true'
+                    if compression == self.Compressions.EUROSTAT
+                    else 'false'
+                )
             },
             headers={
-                'Accept-Language': self._language
+                'Accept-Language': self._language,
+                'Accept-Encoding': (
+                    'gzip'
+                    if compression == self.Compressions.HTTP
+                    else 'identity'
+                )
             }
         )
-        response.raise_for_status()
-        data = response.json()
-        self._version = data['extension']['datastructure']['version']
 
-    def _request_datastructure_definition(self):
-        response = request.get(
-            url=f"{self.DSD_BASE_URL}/{self._dataset_id}/{self._version}",
+    @classmethod
+    def _is_compressed(cls, header: bytes) -> bool:
+        # Whether a body starts with a gzip or a zlib header. A zlib header
+        # names the deflate method and is a multiple of 31 (RFC 1950).
+        if header.startswith(cls.GZIP_MAGIC_NUMBER):
+            return True
+        return (
+            len(header) >= 2
+            and header[0] & 0x0f == 8
+            and header[0] >> 4 <= 7
+            and (header[0] << 8 | header[1]) % 31 == 0
+        )
+
+    @classmethod
+    def _decompress(cls, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        # Decompresses a gzip file or zlib stream piecewise. Responses that
+        # are not compressed despite `compress=true` are passed on unchanged.
+        chunks = iter(chunks)
+        first_chunk = b""
+        for chunk in chunks:
+            first_chunk += chunk
+            if len(first_chunk) >= 2:
+                break
+        if not cls._is_compressed(first_chunk):
+            yield first_chunk
+            yield from chunks
+            return
+
+        # Detects gzip and zlib by the header
+        decompressor = zlib.decompressobj(32 + zlib.MAX_WBITS)
+        yield decompressor.decompress(first_chunk)
+        for chunk in chunks:
+            yield decompressor.decompress(chunk)
+        yield decompressor.flush()
+
+    def _iter_content(
+        self, response: requests.Response, request_type: str
+    ) -> Iterator[bytes]:
+        chunks = response.iter_content(self.STREAM_CHUNK_SIZE)
+        if self._compressions[request_type] == self.Compressions.EUROSTAT:
+            return self._decompress(chunks)
+        return chunks
+
+    def _content(self, response: requests.Response, request_type: str) -> bytes:
+        if self._compressions[request_type] == self.Compressions.EUROSTAT:
+            return b"".join(self._iter_content(response, request_type))
+        return response.content
+
+    def _download_dataflow(
+        self, max_age: float | None = None
+    ) -> Dict[str, Any]:
+        response = self._get(
+            url=f"{self.METADATA_BASE_URL}/{self._dataset_id}/1.0",
             params={
-                'compress': 'false'
+                'format': 'json'
             },
-            headers={
-                'Accept-Language': self._language
-            }
+            request_type=self.RequestTypes.METADATA,
+            max_age=max_age
         )
-        response.raise_for_status()
-        self._datastructure_definition = DatastructureDefinition(
-            response.content
+        return json.loads(
+            self._content(response, self.RequestTypes.METADATA)
         )
 
-    def _request_data(self) -> Dict[str, Any]:
-        params = {
-            'compress': 'false',
-            'format': 'json'
-        }
+    def _download_version(self) -> str:
+        return self._download_dataflow()['extension']['datastructure']['version']
+
+    def request_last_update(self) -> dt.datetime | None:
+        # The time of the last update according to the dataflow. It is not
+        # stored in the `MetadataCache` and the response in the HTTP cache is
+        # always revalidated (`max_age=0`), otherwise it could be as old as
+        # the `ttl`. If unchanged, the request only costs a 304.
+        extension = self._download_dataflow(max_age=0.0).get('extension', {})
+        for annotation in extension.get('annotation', []):
+            if annotation.get('type') != self.UPDATE_ANNOTATION_TYPE:
+                continue
+            try:
+                return dt.datetime.fromisoformat(annotation['date'])
+            except (KeyError, ValueError):
+                return None
+        return None
+
+    @classmethod
+    def request_last_updates(
+        cls,
+        dataset_ids: List[str],
+        language: str,
+        max_workers: int = 1,
+        **kwargs
+    ) -> Dict[str, dt.datetime | None]:
+        # The times of the last update of several datasets, requested in
+        # parallel. `kwargs` are passed on to the datasets.
+        def request_last_update(dataset_id: str) -> dt.datetime | None:
+            return cls(dataset_id, language, **kwargs).request_last_update()
+
+        dataset_ids = sorted(set(dataset_ids))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(
+                dataset_ids, executor.map(request_last_update, dataset_ids)
+            ))
+
+    def is_unchanged_since(self, updated: dt.datetime) -> bool:
+        # Whether the data was not updated since `updated`. Without a time
+        # in the dataflow it counts as changed.
+        last_update = self.request_last_update()
+        return last_update is not None and last_update <= updated
+
+    def _download_datastructure_definition(self) -> str:
+        response = self._get(
+            url=f"{self.DSD_BASE_URL}/{self._dataset_id}/{self.version}",
+            params={},
+            request_type=self.RequestTypes.DATASTRUCTURE_DEFINITION
+        )
+        return self._content(
+            response, self.RequestTypes.DATASTRUCTURE_DEFINITION
+        ).decode('utf-8')
+
+    def _request_version(self):
+        self._version = self._metadata_cache.version(
+            self._dataset_id, self._language, self._download_version
+        )
+
+    def _request_datastructure_definition(self):
+        self._datastructure_definition = (
+            self._metadata_cache.datastructure_definition(
+                self._dataset_id,
+                self._language,
+                self._download_datastructure_definition
+            )
+        )
+
+    def _data_parameters(
+        self,
+        parameters: Dict[str, str],
+        time_periods: List[Tuple[str, str]] | None = None
+    ) -> Dict[str, str]:
+        # `time_periods` replace the ones of the filters
+        params = dict(parameters)
         for filter_ in self._filters:
             params.update(filter_.url_parameters)
-        response = request.get(
+        if time_periods is not None:
+            params.pop('c[TIME_PERIOD]', None)
+            if time_periods:
+                params['c[TIME_PERIOD]'] = (
+                    TimePeriodFilter.format_time_periods(time_periods)
+                )
+        return params
+
+    def _request_data(
+        self, time_periods: List[Tuple[str, str]] | None = None
+    ) -> SdmxJsonStreamParser:
+        # The observations are read piecewise into arrays while the response
+        # is downloaded, without decoding the whole document into Python
+        # objects.
+        return self._get(
             url=f"{self.DATA_BASE_URL}/{self._dataset_id}/1.0/*",
-            params=params,
-            headers={
-                'Accept-Language': self._language
-            }
+            params=self._data_parameters({'format': 'json'}, time_periods),
+            request_type=self.RequestTypes.DATA,
+            read=lambda response: SdmxJsonStreamParser().parse(
+                self._iter_content(response, self.RequestTypes.DATA)
+            )
+        )
+
+    def _request_csv_data(
+        self, time_periods: List[Tuple[str, str]] | None = None
+    ) -> SdmxData:
+        last_modified, content = self._get(
+            url=f"{self.DATA_BASE_URL}/{self._dataset_id}/1.0/*",
+            params=self._data_parameters({
+                'format': 'csvdata',
+                'formatVersion': '2.0'
+            }, time_periods),
+            request_type=self.RequestTypes.DATA,
+            read=lambda response: (
+                response.headers.get('Last-Modified'),
+                self._content(response, self.RequestTypes.DATA)
+            )
+        )
+        # SDMX-CSV has no time of the last update
+        updated = (
+            email.utils.parsedate_to_datetime(last_modified)
+            if last_modified is not None
+            else dt.datetime.now(dt.timezone.utc)
+        )
+        return read_sdmx_csv(
+            content,
+            self.dimension_ids,
+            self._language,
+            updated,
+            self._none_value
         )
-        response.raise_for_status()
-        return response.json()
 
     def add_filter(self, filter_: Filter):
         self._filters.append(filter_)
 
-    def request_data(self):
-        self._data = SdmxData(self._request_data(), self._none_value)
+    def _download_data(
+        self, time_periods: List[Tuple[str, str]] | None = None
+    ) -> SdmxData:
+        if self._data_format == self.Formats.CSV:
+            return self._request_csv_data(time_periods)
+
+        parser = self._request_data(time_periods)
+        value_ids, values = parser.values
+        status_ids, statuses = parser.statuses
+        return SdmxData.from_arrays(
+            parser.json_data,
+            value_ids,
+            values,
+            status_ids,
+            statuses,
+            self._none_value
+        )
+
+    def _query(self) -> DataQuery:
+        # Like the url parameters, later filters replace earlier ones
+        dimension_values, time_periods = {}, []
+        for filter_ in self._filters:
+            if filter_.is_dimension_filter():
+                dimension_values.update(filter_.dimension_values)
+            elif filter_.is_time_period_filter():
+                time_periods = filter_.time_periods
+        return DataQuery(dimension_values, time_periods)
+
+    def _update(
+        self, data: SdmxData, downloaded_at: float
+    ) -> Tuple[SdmxData, float]:
+        # Only loads the periods from the latest period of `data` on and
+        # appends them. The latest period is loaded again: if it differs, or
+        # if `data` is empty, the data was revised and is loaded completely.
+        # Revisions of earlier periods are not noticed, so data last
+        # downloaded completely more than `max_age` of the `DataCache` ago
+        # is loaded completely, too. Returns the data and the time of its
+        # last full download.
+        now = time.time()
+        periods = data.observed_periods
+        if len(periods) == 0 or now - downloaded_at >= self._data_cache.max_age:
+            return self._download_data(), now
+        latest_period = str(periods[-1])
+
+        time_periods = [
+            (operator, time_period)
+            for operator, time_period in self._query().time_periods
+            if operator not in (
+                TimePeriodFilter.Operators.GREATER_OR_EQUALS,
+                TimePeriodFilter.Operators.GREATER
+            )
+        ] + [(TimePeriodFilter.Operators.GREATER_OR_EQUALS, latest_period)]
+        new_data = self._download_data(time_periods)
+
+        if new_data.updated <= data.updated:
+            return data, downloaded_at
+        if not data.has_same_values_at(new_data, latest_period):
+            return self._download_data(), now
+        return data.merge(new_data, latest_period), downloaded_at
+
+    def _is_unchanged(
+        self, data: SdmxData, last_update: dt.datetime | None
+    ) -> bool:
+        # Without `last_update` the dataflow is requested
+        if last_update is None:
+            return self.is_unchanged_since(data.updated)
+        return data.updated >= last_update
+
+    def request_data(self, last_update: dt.datetime | None = None):
+        # Requests whose data was contained in an earlier request are
+        # answered from the `DataCache`. Outdated data in the cache is only
+        # extended by the new periods, if the dataset was updated at all
+        # according to the dataflow. `last_update` is the time of the last
+        # update according to the dataflow, if it is already known: cached
+        # data older than that counts as outdated even within the `ttl`.
+        query = self._query()
+        cache_key = (
+            self._dataset_id, self._language, self._data_format,
+            self._none_value
+        )
+        entry = self._data_cache.get_entry(*cache_key, query)
+        if entry is not None and (
+            last_update is None or entry.data.updated >= last_update
+        ):
+            data, downloaded_at = entry.data, entry.downloaded_at
+        else:
+            outdated_entry = entry or self._data_cache.get_entry(
+                *cache_key, query, include_outdated=True
+            )
+            if outdated_entry is None:
+                downloaded_at = time.time()
+                data = self._download_data()
+            elif self._is_unchanged(outdated_entry.data, last_update):
+                # Nothing was updated, the data is not loaded
+                data = outdated_entry.data
+                downloaded_at = outdated_entry.downloaded_at
+            else:
+                data, downloaded_at = self._update(
+                    outdated_entry.data, outdated_entry.downloaded_at
+                )
+            self._data_cache.put(*cache_key, query, data, downloaded_at)
+        self._data, self._downloaded_at = data, downloaded_at
+
+    def refresh(self):
+        # Updates already loaded data incrementally
+        if self._data is None:
+            self.request_data()
+            return
+        if self.is_unchanged_since(self._data.updated):
+            return
+        assert self._downloaded_at is not None
+        self._data, self._downloaded_at = self._update(
+            self._data, self._downloaded_at
+        )
+        self._data_cache.put(
+            self._dataset_id, self._language, self._data_format,
+            self._none_value, self._query(), self._data, self._downloaded_at
+        )
+
+    def includes_update(self, last_update: dt.datetime | None) -> bool:
+        # Whether the loaded data is at least as new as `last_update`. Data
+        # from the `DataCache` can be older than the dataflow.
+        return last_update is not None and self.data.updated >= last_update
+
+    def select(
+        self, dimension_values: Dict[str, str | List[str]]
+    ) -> 'EurostatDataset':
+        dataset = copy.copy(self)
+        dataset._filters = self._filters[:]
+        dataset._data = self._data.select(dimension_values)
+        return dataset
+
+    @property
+    def dataset_id(self) -> str:
+        return self._dataset_id
+
+    @property
+    def version(self) -> str:
+        if self._version is None:
+            self._request_version()
+        assert self._version is not None
+        return self._version
+
+    @property
+    def datastructure_definition(self) -> DatastructureDefinition:
+        if self._datastructure_definition is None:
+            self._request_datastructure_definition()
+        assert self._datastructure_definition is not None
+        return self._datastructure_definition
 
     @property
     def dimension_ids(self) -> List[str]:
-        return self._datastructure_definition.dimension_ids
+        return self.datastructure_definition.dimension_ids
 
     @property
     def data(self) -> SdmxData:
@@ -126,3 +545,7 @@ class EurostatDataset:
     @property
     def none_value(self) -> str:
         return self._none_value
+
+    @property
+    def data_format(self) -> str:
+        return self._data_format
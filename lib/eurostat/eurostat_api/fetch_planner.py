@@ -0,0 +1,182 @@
+import datetime as dt
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Tuple
+
+from lib.eurostat.eurostat_api.dataset import EurostatDataset
+from lib.eurostat.eurostat_api.filters import DimensionFilter, TimePeriodFilter
+from lib.eurostat.eurostat_api.retry import DeadlineExceeded
+
+
+class FetchPlanner:
+
+    # A combined request asks for the cross product of all dimension values.
+    # If that is more than this factor larger than what the slices need, the
+    # slices are requested one by one instead.
+    MAX_OVERFETCH_FACTOR: float = 2.0
+
+    class Slice:
+
+        key: str
+        dataset_id: str
+        dimension_values: Dict[str, List[str]]
+        time_periods: Tuple[Tuple[str, str], ...]
+
+        def __init__(
+            self,
+            key: str,
+            dataset_id: str,
+            dimension_values: Dict[str, List[str]],
+            time_periods: Tuple[Tuple[str, str], ...]
+        ):
+            self.key = key
+            self.dataset_id = dataset_id
+            self.dimension_values = dimension_values
+            self.time_periods = time_periods
+
+        @property
+        def size(self) -> int:
+            size = 1
+            for values in self.dimension_values.values():
+                size *= len(values)
+            return size
+
+    class Request:
+
+        dataset_id: str
+        dimension_values: Dict[str, List[str]]
+        time_periods: Tuple[Tuple[str, str], ...]
+        slices: List['FetchPlanner.Slice']
+
+        def __init__(self, slices: List['FetchPlanner.Slice']):
+            self.dataset_id = slices[0].dataset_id
+            self.time_periods = slices[0].time_periods
+            self.slices = slices
+            self.dimension_values = {}
+            for slice_ in slices:
+                for dimension_id, values in slice_.dimension_values.items():
+                    union = self.dimension_values.setdefault(dimension_id, [])
+                    union.extend(v for v in values if v not in union)
+
+        @property
+        def size(self) -> int:
+            size = 1
+            for values in self.dimension_values.values():
+                size *= len(values)
+            return size
+
+    _language: str
+    # The times of the last update by dataset id, as probed from the
+    # dataflows before. Cached data older than that is updated.
+    _last_updates: Dict[str, dt.datetime | None]
+    _dataset_kwargs: Dict[str, Any]
+    _slices: Dict[str, Slice]
+
+    def __init__(
+        self,
+        language: str,
+        last_updates: Dict[str, dt.datetime | None] | None = None,
+        **dataset_kwargs
+    ):
+        self._language = language
+        self._last_updates = last_updates or {}
+        self._dataset_kwargs = dataset_kwargs
+        self._slices = {}
+
+    def add(
+        self,
+        key: str,
+        dataset_id: str,
+        dimension_values: Dict[str, str | List[str]],
+        time_periods: List[Tuple[str, str]] | None = None
+    ):
+        assert key not in self._slices, f"Key {key} already added!"
+
+        self._slices[key] = self.Slice(
+            key,
+            dataset_id,
+            {
+                dimension_id: [value] if isinstance(value, str) else list(value)
+                for dimension_id, value in dimension_values.items()
+            },
+            tuple(time_periods or ())
+        )
+
+    def plan(self) -> List[Request]:
+        # Slices of the same dataset can share a request if they filter the
+        # same dimensions and time periods. Otherwise the combined request
+        # would ask for more (or other) data than one of them needs.
+        groups: Dict[Tuple[Any, ...], List[FetchPlanner.Slice]] = {}
+        for slice_ in self._slices.values():
+            group_key = (
+                slice_.dataset_id,
+                tuple(sorted(slice_.dimension_values)),
+                slice_.time_periods
+            )
+            groups.setdefault(group_key, []).append(slice_)
+
+        requests = []
+        for slices in groups.values():
+            request = self.Request(slices)
+            needed_size = sum(slice_.size for slice_ in slices)
+            if request.size > self.MAX_OVERFETCH_FACTOR * needed_size:
+                requests.extend(self.Request([slice_]) for slice_ in slices)
+            else:
+                requests.append(request)
+        return requests
+
+    def _request(self, request: Request) -> EurostatDataset:
+        dataset = EurostatDataset(
+            request.dataset_id, self._language, **self._dataset_kwargs
+        )
+
+        dimension_filter = DimensionFilter(dataset)
+        for dimension_id, values in request.dimension_values.items():
+            for value in values:
+                dimension_filter.add_dimension_value(dimension_id, value)
+
+        if request.time_periods:
+            time_period_filter = TimePeriodFilter(dataset)
+            for operator, time_period in request.time_periods:
+                time_period_filter.add(operator, time_period)
+
+        dataset.request_data(self._last_updates.get(request.dataset_id))
+        return dataset
+
+    @staticmethod
+    def _split(
+        request: Request, dataset: EurostatDataset
+    ) -> Dict[str, EurostatDataset]:
+        return {
+            slice_.key: (
+                dataset
+                if len(request.slices) == 1
+                else dataset.select(slice_.dimension_values)
+            )
+            for slice_ in request.slices
+        }
+
+    def fetch(self, max_workers: int = 1) -> Dict[str, EurostatDataset]:
+        requests = self.plan()
+        datasets = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._request, request): request
+                for request in requests
+            }
+            try:
+                for future in as_completed(futures):
+                    request = futures[future]
+                    datasets.update(self._split(request, future.result()))
+            except DeadlineExceeded as exception:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise DeadlineExceeded(
+                    f"Deadline exceeded after loading {len(datasets)} "
+                    f"of {len(self._slices)} datasets!",
+                    datasets
+                ) from exception
+
+        return {key: datasets[key] for key in self._slices}
+
+    @property
+    def request_count(self) -> int:
+        return len(self.plan())
@@ -53,6 +53,10 @@ class DimensionFilter(Filter):
             self._dimension_values[dimension_id] = []
         self._dimension_values[dimension_id].append(value)
 
+    @property
+    def dimension_values(self) -> Dict[str, List[str]]:
+        return self._dimension_values
+
     @property
     def url_parameters(self) -> Dict[str, str]:
         return {
@@ -108,13 +112,21 @@ class TimePeriodFilter(Filter):
 
         self._operators_periods.append((operator, time_period))
 
+    @property
+    def time_periods(self) -> List[Tuple[str, str]]:
+        return self._operators_periods
+
+    @staticmethod
+    def format_time_periods(operators_periods: List[Tuple[str, str]]) -> str:
+        return '+'.join(
+            f"{operator}:{time_period}"
+            for operator, time_period in operators_periods
+        )
+
     @property
     def url_parameters(self) -> Dict[str, str]:
         return {
-            'c[TIME_PERIOD]': '+'.join(
-                f"{operator}:{time_period}"
-                for operator, time_period in self._operators_periods
-            )
+            'c[TIME_PERIOD]': self.format_time_periods(self._operators_periods)
         }
 
     def is_dimension_filter(self) -> bool:
@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Tuple
+
+from lib.eurostat.eurostat_api.datastructure_definition import DatastructureDefinition
+
+
+class MetadataCache:
+
+    DEFAULT_DIRECTORY: str = os.path.join(".cache", "metadata")
+    DEFAULT_TTL: float = 24 * 60 * 60.0  # s
+
+    VERSION: str = 'version'
+    DATASTRUCTURE_DEFINITION: str = 'datastructure_definition'
+
+    _directory: str | None
+    _ttl: float
+    _entries: Dict[Tuple[str, str, str], Tuple[float, Any]]
+    _lock: threading.Lock
+    _key_locks: Dict[Tuple[str, str, str], threading.Lock]
+
+    def __init__(
+        self,
+        directory: str | None = DEFAULT_DIRECTORY,
+        ttl: float = DEFAULT_TTL
+    ):
+        self._directory = directory
+        self._ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def _key_lock(self, key: Tuple[str, str, str]) -> threading.Lock:
+        with self._lock:
+            if key not in self._key_locks:
+                self._key_locks[key] = threading.Lock()
+            return self._key_locks[key]
+
+    def _filename(self, key: Tuple[str, str, str]) -> str:
+        assert self._directory is not None
+        dataset_id, language, kind = key
+        return os.path.join(
+            self._directory, f"{dataset_id}.{language}.{kind}.json"
+        )
+
+    def _is_fresh(self, stored_at: float) -> bool:
+        return time.time() - stored_at < self._ttl
+
+    def _read(self, key: Tuple[str, str, str]) -> Tuple[float, str] | None:
+        if self._directory is None:
+            return None
+        try:
+            with open(self._filename(key), 'r', encoding='utf-8') as file:
+                content = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return content['stored_at'], content['value']
+
+    def _write(self, key: Tuple[str, str, str], stored_at: float, value: str):
+        if self._directory is None:
+            return
+        # The directory is only created when something is stored, not
+        # already when the module is imported
+        os.makedirs(self._directory, exist_ok=True)
+        filename = self._filename(key)
+        temporary_filename = f"{filename}.{threading.get_ident()}.tmp"
+        with open(temporary_filename, 'w', encoding='utf-8') as file:
+            json.dump({'stored_at': stored_at, 'value': value}, file)
+        os.replace(temporary_filename, filename)
+
+    def _get(
+        self,
+        key: Tuple[str, str, str],
+        loader: Callable[[], str],
+        parser: Callable[[str], Any]
+    ) -> Any:
+        # One lock per key, so that concurrent datasets with the same id wait
+        # for a single download instead of all fetching the same document.
+        with self._key_lock(key):
+            entry = self._entries.get(key)
+            if entry is not None and self._is_fresh(entry[0]):
+                return entry[1]
+
+            stored = self._read(key)
+            if stored is not None and self._is_fresh(stored[0]):
+                stored_at, raw_value = stored
+            else:
+                stored_at, raw_value = time.time(), loader()
+                self._write(key, stored_at, raw_value)
+
+            value = parser(raw_value)
+            self._entries[key] = (stored_at, value)
+            return value
+
+    def version(
+        self, dataset_id: str, language: str, loader: Callable[[], str]
+    ) -> str:
+        return self._get(
+            (dataset_id, language, self.VERSION), loader, str
+        )
+
+    def datastructure_definition(
+        self, dataset_id: str, language: str, loader: Callable[[], str]
+    ) -> DatastructureDefinition:
+        return self._get(
+            (dataset_id, language, self.DATASTRUCTURE_DEFINITION),
+            loader,
+            DatastructureDefinition
+        )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._directory is not None and os.path.isdir(self._directory):
+            for name in os.listdir(self._directory):
+                os.remove(os.path.join(self._directory, name))
+
+
+METADATA_CACHE: MetadataCache = MetadataCache()
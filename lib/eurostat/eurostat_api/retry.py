@@ -0,0 +1,155 @@
+import email.utils
+import random
+import time
+from typing import Any, Callable, Dict, Tuple
+
+import requests
+
+
+class DeadlineExceeded(TimeoutError):
+
+    partial_results: Dict[str, Any]
+
+    def __init__(self, message: str, partial_results: Dict[str, Any] | None = None):
+        super().__init__(message)
+        self.partial_results = partial_results or {}
+
+
+class Deadline:
+
+    _expires_at: float | None
+
+    def __init__(self, seconds: float | None):
+        self._expires_at = (
+            None if seconds is None else time.monotonic() + seconds
+        )
+
+    @property
+    def remaining(self) -> float | None:
+        if self._expires_at is None:
+            return None
+        return max(0.0, self._expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        remaining = self.remaining
+        return remaining is not None and remaining <= 0.0
+
+    def check(self):
+        if self.expired:
+            raise DeadlineExceeded("Deadline exceeded!")
+
+
+class RetryPolicy:
+
+    RETRY_STATUS_CODES: Tuple[int, ...] = (429, 500, 502, 503, 504)
+    RETRY_EXCEPTIONS: Tuple[type, ...] = (
+        requests.ConnectionError, requests.Timeout,
+        requests.exceptions.ChunkedEncodingError
+    )
+
+    _max_attempts: int
+    _base_delay: float
+    _max_delay: float
+    _jitter: float
+    _timeout: float
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        base_delay: float = 1.0,  # s
+        max_delay: float = 60.0,  # s
+        jitter: float = 0.5,  # fraction of the delay
+        timeout: float = 60.0  # s, per request
+    ):
+        assert max_attempts >= 1, "max_attempts must be at least 1!"
+
+        self._max_attempts = max_attempts
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._jitter = jitter
+        self._timeout = timeout
+
+    @staticmethod
+    def _retry_after(response: requests.Response | None) -> float | None:
+        if response is None or 'Retry-After' not in response.headers:
+            return None
+        value = response.headers['Retry-After'].strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            date = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, date.timestamp() - time.time())
+
+    def delay(
+        self, attempt: int, response: requests.Response | None = None
+    ) -> float:
+        retry_after = self._retry_after(response)
+        if retry_after is not None:
+            return min(retry_after, self._max_delay)
+        delay = min(self._base_delay * 2 ** (attempt - 1), self._max_delay)
+        return delay * (1.0 + random.uniform(-self._jitter, self._jitter))
+
+    def _sleep(self, seconds: float, deadline: Deadline | None):
+        if deadline is not None:
+            remaining = deadline.remaining
+            if remaining is not None and remaining <= seconds:
+                raise DeadlineExceeded("Deadline exceeded while retrying!")
+        time.sleep(seconds)
+
+    def _timeout_for(self, deadline: Deadline | None) -> float:
+        remaining = None if deadline is None else deadline.remaining
+        if remaining is None:
+            return self._timeout
+        return max(0.001, min(self._timeout, remaining))
+
+    def get(
+        self,
+        get: Callable[..., requests.Response],
+        url: str,
+        deadline: Deadline | None = None,
+        read: Callable[[requests.Response], Any] | None = None,
+        **kwargs
+    ) -> Any:
+        # With `read` the result of `read(response)` is returned instead of
+        # the response. Reading a streamed body is part of the attempt, so a
+        # connection lost while reading is retried like a failed request.
+        for attempt in range(1, self._max_attempts + 1):
+            if deadline is not None:
+                deadline.check()
+            is_last_attempt = attempt == self._max_attempts
+            response = None
+            try:
+                response = get(
+                    url=url, timeout=self._timeout_for(deadline), **kwargs
+                )
+                if (
+                    response.status_code not in self.RETRY_STATUS_CODES
+                    or is_last_attempt
+                ):
+                    return response if read is None else read(response)
+            except self.RETRY_EXCEPTIONS:
+                if response is not None:
+                    response.close()
+                if deadline is not None and deadline.expired:
+                    raise DeadlineExceeded("Deadline exceeded!")
+                if is_last_attempt:
+                    raise
+                self._sleep(self.delay(attempt), deadline)
+                continue
+
+            # A streamed body is not read, so the connection is released
+            # before waiting
+            response.close()
+            self._sleep(self.delay(attempt, response), deadline)
+
+        raise AssertionError("unreachable")
+
+    @property
+    def max_attempts(self) -> int:
+        return self._max_attempts
+
+
+DEFAULT_RETRY_POLICY: RetryPolicy = RetryPolicy()
@@ -0,0 +1,109 @@
+import datetime as dt
+import io
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+from lib.eurostat.eurostat_api.sdmx_data import SdmxData
+
+# Columns of SDMX-CSV that are not listed as dimensions in the
+# datastructure definition
+TIME_COLUMN: str = 'TIME_PERIOD'
+VALUE_COLUMN: str = 'OBS_VALUE'
+FLAG_COLUMN: str = 'OBS_FLAG'
+
+DICTIONARY_TYPE: pa.DataType = pa.dictionary(pa.int32(), pa.string())
+
+
+def _header(content: bytes) -> List[str]:
+    end = content.find(b'\n')
+    line = content if end == -1 else content[:end]
+    return [
+        name.strip().strip('"')
+        for name in line.decode('utf-8-sig').split(',')
+    ]
+
+
+def _status_values(flags: pd.Categorical) -> pd.Categorical:
+    # Missing flags become `NO_STATUS`, repeated flags are merged like in
+    # SDMX-JSON, e.g. "pp" -> "p".
+    merged = pd.Categorical(
+        ["".join(dict.fromkeys(flag)) for flag in flags.categories]
+        + [SdmxData.NO_STATUS]
+    )
+    codes = np.where(flags.codes == -1, len(flags.categories), flags.codes)
+    return pd.Categorical.from_codes(
+        merged.codes[codes], categories=merged.categories
+    )
+
+
+def read_sdmx_csv(
+    content: bytes,
+    dimension_ids: List[str],
+    language: str,
+    updated: dt.datetime,
+    none_value: Any
+) -> SdmxData:
+    # `dimension_ids` are the dimensions of the datastructure definition
+    # (without the time). Their order is taken from the csv header, so the
+    # columns are in the same order as in SDMX-JSON.
+    header = _header(content)
+    csv_dimension_ids = [
+        column for column in header if column in dimension_ids
+    ]
+    columns = csv_dimension_ids + [TIME_COLUMN]
+    column_types = {column: DICTIONARY_TYPE for column in columns}
+    column_types[VALUE_COLUMN] = pa.float64()
+    if FLAG_COLUMN in header:
+        columns.append(FLAG_COLUMN)
+        column_types[FLAG_COLUMN] = DICTIONARY_TYPE
+
+    table = pa_csv.read_csv(
+        io.BytesIO(content),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=column_types,
+            include_columns=columns + [VALUE_COLUMN],
+            strings_can_be_null=True
+        )
+    )
+
+    data: Dict[str, Any] = {}
+    for column in csv_dimension_ids + [TIME_COLUMN]:
+        dimension_id = 'time' if column == TIME_COLUMN else column
+        data[dimension_id] = table.column(column).to_pandas().array
+    data['status'] = _status_values(
+        table.column(FLAG_COLUMN).to_pandas().array
+        if FLAG_COLUMN in header
+        else pd.Categorical([None] * table.num_rows)
+    )
+    data['observation'] = (
+        table.column(VALUE_COLUMN).to_numpy().astype(np.float64)
+    )
+    dataframe = pd.DataFrame(data)
+
+    # SDMX-CSV has no labels, the codes are used instead.
+    all_dimension_ids = csv_dimension_ids + ['time']
+    periods = sorted(dataframe['time'].cat.categories)
+    metadata = {
+        'updated': updated.strftime(SdmxData.UPDATED_FORMAT),
+        'annotations': {
+            'OBS_COUNT': str(table.num_rows),
+            'OBS_PERIOD_OVERALL_OLDEST': periods[0] if periods else None,
+            'OBS_PERIOD_OVERALL_LATEST': periods[-1] if periods else None
+        },
+        'dimension_ids': all_dimension_ids,
+        'data_shape': [
+            len(dataframe[d_id].cat.categories) for d_id in all_dimension_ids
+        ],
+        'dimension_labels': {d_id: d_id for d_id in all_dimension_ids},
+        'dimension_value_labels': {
+            d_id: {value: value for value in dataframe[d_id].cat.categories}
+            for d_id in all_dimension_ids
+        },
+        'language': language,
+        'status_labels': {}
+    }
+    return SdmxData.from_dataframe(dataframe, metadata, none_value)
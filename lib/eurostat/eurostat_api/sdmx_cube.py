@@ -0,0 +1,168 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class SdmxCube:
+
+    # Datasets with fewer observations per cell are stored as a coordinate
+    # list instead of a dense array.
+    MIN_DENSITY: float = 0.1
+    MAX_DENSE_SIZE: int = 50_000_000  # cells
+
+    # Status code of cells without an observation
+    NO_OBSERVATION: int = -1
+
+    _dimension_ids: List[str]
+    _dimension_values: List[np.ndarray]
+    _positions: List[Dict[str, int]]
+    _status_categories: np.ndarray
+    _no_status: str
+    _is_dense: bool
+    # dense: arrays with the shape of the cube
+    # sparse: one entry per observation, `_coordinates` has one column per
+    # dimension and `_flat_positions` maps the flat index to the entry
+    _observations: np.ndarray
+    _status_codes: np.ndarray
+    _coordinates: np.ndarray | None
+    _flat_positions: Dict[int, int] | None
+
+    def __init__(
+        self,
+        dimension_ids: List[str],
+        dimension_values: List[np.ndarray],
+        coordinates: np.ndarray,
+        observations: np.ndarray,
+        statuses: pd.Categorical,
+        no_status: str,
+        dense: bool | None = None
+    ):
+        self._dimension_ids = dimension_ids
+        self._dimension_values = dimension_values
+        self._positions = [
+            {value: i for i, value in enumerate(values)}
+            for values in dimension_values
+        ]
+        self._status_categories = np.array(statuses.categories, dtype=object)
+        self._no_status = no_status
+
+        if dense is None:
+            dense = (
+                self.size <= self.MAX_DENSE_SIZE
+                and len(observations) >= self.MIN_DENSITY * self.size
+            )
+        self._is_dense = dense
+
+        status_codes = np.asarray(statuses.codes)
+        if self._is_dense:
+            index = tuple(coordinates.T)
+            self._observations = np.full(self.shape, np.nan)
+            self._observations[index] = observations
+            self._status_codes = np.full(
+                self.shape, self.NO_OBSERVATION, dtype=status_codes.dtype
+            )
+            self._status_codes[index] = status_codes
+            self._coordinates = None
+            self._flat_positions = None
+        else:
+            self._observations = observations
+            self._status_codes = status_codes
+            self._coordinates = coordinates
+            flat_indices = np.ravel_multi_index(tuple(coordinates.T), self.shape)
+            self._flat_positions = dict(
+                zip(flat_indices.tolist(), range(len(flat_indices)))
+            )
+
+    def _status_values(self, status_codes: np.ndarray) -> np.ndarray:
+        statuses = np.full(status_codes.shape, self._no_status, dtype=object)
+        has_status = status_codes != self.NO_OBSERVATION
+        statuses[has_status] = self._status_categories[status_codes[has_status]]
+        return statuses
+
+    def _get_cell(self, positions: Tuple[int, ...]) -> Tuple[float, int]:
+        if self._is_dense:
+            return self._observations[positions], self._status_codes[positions]
+        entry = self._flat_positions.get(
+            int(np.ravel_multi_index(positions, self.shape))
+        )
+        if entry is None:
+            return np.nan, self.NO_OBSERVATION
+        return self._observations[entry], self._status_codes[entry]
+
+    def _get_block(
+        self, positions: List[int | slice]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if self._is_dense:
+            index = tuple(positions)
+            return self._observations[index], self._status_codes[index]
+
+        mask = np.ones(len(self._observations), dtype=bool)
+        kept_dimensions = []
+        for dimension, position in enumerate(positions):
+            if isinstance(position, slice):
+                kept_dimensions.append(dimension)
+            else:
+                mask &= self._coordinates[:, dimension] == position
+        shape = tuple(self.shape[d] for d in kept_dimensions)
+        observations = np.full(shape, np.nan)
+        status_codes = np.full(
+            shape, self.NO_OBSERVATION, dtype=self._status_codes.dtype
+        )
+        index = tuple(self._coordinates[mask][:, kept_dimensions].T)
+        observations[index] = self._observations[mask]
+        status_codes[index] = self._status_codes[mask]
+        return observations, status_codes
+
+    def sel(
+        self, **dimension_values: str
+    ) -> Tuple[np.ndarray | float, np.ndarray | str]:
+        # Returns the observations and statuses for the given dimension
+        # values. The result has one axis for every dimension that is not
+        # given, so selecting a value for all dimensions returns scalars.
+        positions = [slice(None)] * len(self._dimension_ids)
+        for dimension_id, value in dimension_values.items():
+            assert dimension_id in self._dimension_ids, \
+                f"Dimension {dimension_id} must be in data!"
+            dimension = self._dimension_ids.index(dimension_id)
+            if value not in self._positions[dimension]:
+                raise KeyError(f"{value} is not a value of {dimension_id}!")
+            positions[dimension] = self._positions[dimension][value]
+
+        if len(dimension_values) == len(self._dimension_ids):
+            observation, status_code = self._get_cell(tuple(positions))
+            status = self._status_values(np.array([status_code]))[0]
+            return np.float64(observation), status
+
+        observations, status_codes = self._get_block(positions)
+        return observations, self._status_values(status_codes)
+
+    def values_of(self, dimension_id: str) -> np.ndarray:
+        return self._dimension_values[self._dimension_ids.index(dimension_id)]
+
+    @property
+    def dimension_ids(self) -> List[str]:
+        return self._dimension_ids
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return tuple(len(values) for values in self._dimension_values)
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape, dtype=np.int64))
+
+    @property
+    def is_dense(self) -> bool:
+        return self._is_dense
+
+    @property
+    def observations(self) -> np.ndarray:
+        # Dense array of all observations (NaN where there is none)
+        return self._get_block([slice(None)] * len(self._dimension_ids))[0]
+
+    @property
+    def statuses(self) -> np.ndarray:
+        return self._status_values(
+            self._get_block([slice(None)] * len(self._dimension_ids))[1]
+        )
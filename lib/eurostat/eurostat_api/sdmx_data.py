@@ -1,78 +1,296 @@
+import copy
 import datetime as dt
+import json
+import os
+import threading
 from typing import Any, Dict, List, Tuple
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+
+from lib.eurostat.eurostat_api.sdmx_cube import SdmxCube
 
 
 class SdmxData:
 
-    _json_data: Dict[str, Any]
+    # Status of observations without any flag
+    NO_STATUS: str = ""
+
+    UPDATED_FORMAT: str = "%Y-%m-%dT%H:%M:%S%z"
+
+    # Snapshots are Arrow IPC files with the metadata stored as json in the
+    # schema metadata under this key.
+    SNAPSHOT_METADATA_KEY: bytes = b'sdmx_data'
+    SNAPSHOT_INDEX_COLUMN: str = '__index__'
+
     _none_value: Any
     _updated: dt.datetime
     _annotations: Dict[str, str]
+    _dimension_ids: List[str]
+    _data_shape: Tuple[int, ...]
+    _dimension_labels: Dict[str, str]
+    _dimension_value_labels: Dict[str, Dict[str, str]]
+    _language: str
+    _status_labels: Dict[str, str]
     _dataframe: pd.DataFrame
-    _index_dataframe: pd.DataFrame
+    _index_dataframe: pd.DataFrame | None
+    _lookup_indices: Dict[Tuple[str, ...], Dict[Tuple[str, ...], int]]
+    _latest_time_values: Dict[Tuple[Any, ...], str | None]
+    _pivot_tables: Dict[Tuple[Any, ...], Tuple[pd.DataFrame, pd.DataFrame]]
+    _cubes: Dict[bool | None, SdmxCube]
 
     def __init__(self, json_data: Dict[str, Any], none_value: Any):
-        self._json_data = json_data
+        # Only the metadata and the dataframe are kept. The decoded json
+        # data is not referenced after parsing.
+        value_data = json_data.get('value', {})
+        status_data = json_data.get('status', {})
+        self._initialize(
+            json_data,
+            self._get_ids(value_data),
+            np.array(list(value_data.values()), dtype=np.float64),
+            self._get_ids(status_data),
+            np.array(list(status_data.values()), dtype=object),
+            none_value
+        )
+
+    @classmethod
+    def from_arrays(
+        cls,
+        json_data: Dict[str, Any],
+        value_ids: np.ndarray,
+        values: np.ndarray,
+        status_ids: np.ndarray,
+        statuses: np.ndarray,
+        none_value: Any
+    ) -> 'SdmxData':
+        # For SDMX-JSON that was parsed without its 'value' and 'status'
+        # objects, which are given as arrays of ids and their values instead.
+        data = cls.__new__(cls)
+        data._initialize(
+            json_data, value_ids, values, status_ids, statuses, none_value
+        )
+        return data
+
+    def _initialize(
+        self,
+        json_data: Dict[str, Any],
+        value_ids: np.ndarray,
+        values: np.ndarray,
+        status_ids: np.ndarray,
+        statuses: np.ndarray,
+        none_value: Any
+    ):
         self._none_value = none_value
+        self._set_metadata(self._extract_metadata(json_data))
+        self._construct_dataframe(value_ids, values, status_ids, statuses)
+        self._clear_caches()
+
+    @classmethod
+    def from_dataframe(
+        cls,
+        dataframe: pd.DataFrame,
+        metadata: Dict[str, Any],
+        none_value: Any
+    ) -> 'SdmxData':
+        data = cls.__new__(cls)
+        data._none_value = none_value
+        data._set_metadata(metadata)
+        data._dataframe = dataframe
+        data._clear_caches()
+        return data
+
+    def _clear_caches(self):
+        # Everything derived from `_dataframe` that is computed on demand
+        self._index_dataframe = None
+        self._lookup_indices = {}
+        self._latest_time_values = {}
+        self._pivot_tables = {}
+        self._cubes = {}
+
+    @staticmethod
+    def _extract_metadata(json_data: Dict[str, Any]) -> Dict[str, Any]:
+        dimension_ids = json_data['id']
+        dimension_data = json_data['dimension']
+        return {
+            'updated': json_data['updated'],
+            'annotations': {
+                a['type']: (
+                    a.get('title', None)
+                    or a.get('text', None)
+                    or a.get('date', None)
+                )
+                for a in json_data['extension']['annotation']
+            },
+            'dimension_ids': dimension_ids,
+            'data_shape': json_data['size'],
+            'dimension_labels': {
+                d_id: dimension_data[d_id]['label']
+                for d_id in dimension_ids
+            },
+            'dimension_value_labels': {
+                d_id: {
+                    value: dimension_data[d_id]['category']['label'][value]
+                    for value in dimension_data[d_id]['category']['index']
+                }
+                for d_id in dimension_ids
+            },
+            'language': json_data['extension']['lang'],
+            'status_labels': (
+                dict(json_data['extension']['status']['label'])
+                if 'status' in json_data
+                else {}
+            )
+        }
+
+    def _set_metadata(self, metadata: Dict[str, Any]):
         self._updated = dt.datetime.strptime(
-            self._json_data['updated'], "%Y-%m-%dT%H:%M:%S%z"
+            metadata['updated'], self.UPDATED_FORMAT
         )
-        self._extract_annotations()
-        self._construct_dataframe()
-
-    def _extract_annotations(self):
-        self._annotations = {
-            a['type']: (
-                a.get('title', None)
-                or a.get('text', None)
-                or a.get('date', None)
-            )
-            for a in self._json_data['extension']['annotation']
+        self._annotations = metadata['annotations']
+        self._dimension_ids = metadata['dimension_ids']
+        self._data_shape = tuple(metadata['data_shape'])
+        self._dimension_labels = metadata['dimension_labels']
+        self._dimension_value_labels = metadata['dimension_value_labels']
+        self._language = metadata['language'].lower()
+        self._status_labels = metadata['status_labels']
+
+    def _get_metadata(self) -> Dict[str, Any]:
+        return {
+            'updated': self._updated.strftime(self.UPDATED_FORMAT),
+            'annotations': self._annotations,
+            'dimension_ids': self._dimension_ids,
+            'data_shape': list(self._data_shape),
+            'dimension_labels': self._dimension_labels,
+            'dimension_value_labels': self._dimension_value_labels,
+            'language': self._language,
+            'status_labels': self._status_labels
         }
 
+    def save(self, filename: str, compression: str | None = None):
+        # Writes the parsed data as an Arrow IPC file. Dimension values and
+        # statuses are stored as dictionary arrays, just like in memory.
+        # A `compression` ('lz4' or 'zstd') makes the file a lot smaller, but
+        # the columns then have to be decompressed when they are loaded.
+        columns = {}
+        for column_id in self.dimension_ids + ['status']:
+            categorical = self._dataframe[column_id].array
+            columns[column_id] = pa.DictionaryArray.from_arrays(
+                pa.array(categorical.codes),
+                pa.array(np.asarray(categorical.categories), type=pa.string())
+            )
+        columns['observation'] = pa.array(
+            self._dataframe['observation'].to_numpy()
+        )
+        columns[self.SNAPSHOT_INDEX_COLUMN] = pa.array(
+            self._dataframe.index.to_numpy()
+        )
+        metadata = {**self._get_metadata(), 'none_value': self._none_value}
+        table = pa.table(columns).replace_schema_metadata({
+            self.SNAPSHOT_METADATA_KEY: json.dumps(metadata)
+        })
+
+        temporary_filename = f"{filename}.{threading.get_ident()}.tmp"
+        with pa.OSFile(temporary_filename, 'wb') as sink:
+            with pa.ipc.new_file(
+                sink,
+                table.schema,
+                options=pa.ipc.IpcWriteOptions(compression=compression)
+            ) as writer:
+                writer.write_table(table)
+        os.replace(temporary_filename, filename)
+
+    @classmethod
+    def load(cls, filename: str, memory_map: bool = True) -> 'SdmxData':
+        # With `memory_map` the columns are read straight from the mapped
+        # file instead of being copied into memory first.
+        with (
+            pa.memory_map(filename, 'r')
+            if memory_map
+            else pa.OSFile(filename, 'rb')
+        ) as source:
+            table = pa.ipc.open_file(source).read_all()
+        metadata = json.loads(
+            table.schema.metadata[cls.SNAPSHOT_METADATA_KEY]
+        )
+        none_value = metadata.pop('none_value')
+        dataframe = table.to_pandas(split_blocks=True)
+        dataframe = dataframe.set_index(cls.SNAPSHOT_INDEX_COLUMN)
+        dataframe.index.name = None
+        return cls.from_dataframe(dataframe, metadata, none_value)
+
     def _get_all_dimension_values(self) -> List[np.ndarray]:
-        dimension_data = self._json_data['dimension']
         return [
-            np.array([
-                value for value
-                in dimension_data[d_id]['category']['index'].keys()
-            ])
-            for d_id in self._json_data['id']
+            np.array(list(self._dimension_value_labels[d_id].keys()))
+            for d_id in self._dimension_ids
         ]
 
-    def _get_observation_ids(self) -> np.ndarray:
-        return np.array(
-            list(self._json_data['value'].keys())
-            + (
-                list(self._json_data['status'].keys())
-                if 'status' in self._json_data
-                else []
-            ),
-            dtype=int
-        )
+    @staticmethod
+    def _get_ids(data: Dict[str, Any]) -> np.ndarray:
+        return np.fromiter(map(int, data.keys()), dtype=np.int64, count=len(data))
+
+    @staticmethod
+    def _get_observation_ids(
+        value_ids: np.ndarray, status_ids: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # Every observation with a value comes first (in the order of the
+        # json data), followed by the observations that only have a status.
+        # The second array is the row index each observation would get if
+        # the value and status ids were simply concatenated.
+        is_status_only = ~np.isin(status_ids, value_ids)
+        observation_ids = np.concatenate((value_ids, status_ids[is_status_only]))
+        row_index = np.concatenate((
+            np.arange(len(value_ids)),
+            len(value_ids) + np.flatnonzero(is_status_only)
+        ))
+        return observation_ids, row_index
 
+    @staticmethod
     def _get_observation_values(
-        self, observation_ids: np.ndarray
+        values: np.ndarray, observation_ids: np.ndarray
     ) -> np.ndarray:
-        if 'value' not in self._json_data:
-            return np.full(observation_ids.shape, self._none_value)
-        return np.array([
-            self._json_data['value'].get(str(obs_id), self._none_value)
-            for obs_id in observation_ids
-        ])
+        # Observations without a value are always at the end (see
+        # `_get_observation_ids`), so the values can be taken in bulk.
+        observation_values = np.full(len(observation_ids), np.nan)
+        observation_values[:len(values)] = values
+        return observation_values
 
     def _get_status_values(
-        self, observation_ids: np.ndarray
-    ) -> np.ndarray:
-        if 'status' not in self._json_data:
-            return np.full(observation_ids.shape, self._none_value)
-        return np.array([
-            self._json_data['status'].get(str(obs_id), self._none_value)
-            for obs_id in observation_ids
-        ])
+        self,
+        status_ids: np.ndarray,
+        statuses: np.ndarray,
+        observation_ids: np.ndarray
+    ) -> pd.Categorical:
+        if len(status_ids) == 0:
+            return pd.Categorical.from_codes(
+                np.zeros(len(observation_ids), dtype=np.int8),
+                categories=[self.NO_STATUS]
+            )
+        order = np.argsort(status_ids, kind='stable')
+        sorted_status_ids = status_ids[order]
+        positions = np.minimum(
+            np.searchsorted(sorted_status_ids, observation_ids),
+            len(sorted_status_ids) - 1
+        )
+        has_status = sorted_status_ids[positions] == observation_ids
+        statuses = statuses[order]
+        status_values = np.full(
+            observation_ids.shape, self.NO_STATUS, dtype=object
+        )
+        status_values[has_status] = statuses[positions[has_status]]
+        return self._merge_status_flags(status_values)
+
+    @staticmethod
+    def _merge_status_flags(status_values: np.ndarray) -> pd.Categorical:
+        # Removes repeated flags from every status, e.g. "pp" -> "p". Only
+        # the few distinct statuses are processed in Python.
+        codes, uniques = pd.factorize(status_values)
+        merged = pd.Categorical(
+            ["".join(dict.fromkeys(status)) for status in uniques]
+        )
+        return pd.Categorical.from_codes(
+            merged.codes[codes], categories=merged.categories
+        )
 
     def _get_dimension_indices(
         self, observation_ids: np.ndarray
@@ -87,161 +305,447 @@ class SdmxData:
             )
         return dimension_indices
 
+    @staticmethod
     def _get_dimension_values(
-        self,
         dimension_indices: np.ndarray,
         all_dimension_values: List[np.ndarray]
-    ) -> np.ndarray:
-        return np.array([
-            specific_dimension_values[dimension_indices[:, i]]
+    ) -> List[pd.Categorical]:
+        # The dimension values are only stored once per dataset, every
+        # observation just holds the position of its value.
+        return [
+            pd.Categorical.from_codes(
+                dimension_indices[:, i],
+                categories=pd.Index(specific_dimension_values, dtype=object)
+            )
             for i, specific_dimension_values in enumerate(
                 all_dimension_values
             )
-        ]).T
+        ]
 
-    def _get_dataframe_data(
+    def _get_dataframe(
         self,
-        data: np.ndarray,
-        status_values: np.ndarray,
-        observation_values: np.ndarray
-    ):
-        data = np.hstack((
-            data,
-            status_values[:, None],
-            observation_values[:, None]
+        columns: List[Any],
+        status_values: pd.Categorical,
+        observation_values: np.ndarray,
+        row_index: np.ndarray
+    ) -> pd.DataFrame:
+        data = dict(zip(
+            self.dataframe_columns,
+            [*columns, status_values, observation_values]
         ))
-        return data
+        return pd.DataFrame(data, index=row_index)
 
-    def _construct_dataframe(self):
-        observation_ids = self._get_observation_ids()
+    def _construct_dataframe(
+        self,
+        value_ids: np.ndarray,
+        values: np.ndarray,
+        status_ids: np.ndarray,
+        statuses: np.ndarray
+    ):
+        observation_ids, row_index = self._get_observation_ids(
+            value_ids, status_ids
+        )
         dimension_indices = self._get_dimension_indices(observation_ids)
-        all_dimension_values = self._get_all_dimension_values()
         dimension_values = self._get_dimension_values(
-            dimension_indices, all_dimension_values
+            dimension_indices, self._get_all_dimension_values()
+        )
+        status_values = self._get_status_values(
+            status_ids, statuses, observation_ids
+        )
+        observation_values = self._get_observation_values(
+            values, observation_ids
+        )
+
+        self._dataframe = self._get_dataframe(
+            dimension_values, status_values, observation_values, row_index
+        )
+
+    def _construct_index_dataframe(self):
+        # The codes of the dimension columns are the positions of the values
+        # in the dimensions of the json data.
+        index_dataframe = self._dataframe.copy()
+        for dimension_id in self.dimension_ids:
+            index_dataframe[dimension_id] = (
+                self._dataframe[dimension_id].cat.codes.astype(int)
+            )
+        self._index_dataframe = index_dataframe
+
+    @staticmethod
+    def _get_mask(
+        df: pd.DataFrame, dimension_values: Dict[str, List[str]]
+    ) -> np.ndarray:
+        mask = np.ones(len(df), dtype=bool)
+        for dimension_id, values in dimension_values.items():
+            mask &= df[dimension_id].isin(values).to_numpy()
+        return mask
+
+    def select(
+        self, dimension_values: Dict[str, str | List[str]]
+    ) -> 'SdmxData':
+        # Returns a view on the observations with the given dimension values,
+        # e.g. to split up the answer of a request that combined the filters
+        # of several datasets.
+        for dimension_id in dimension_values:
+            assert dimension_id in self.dimension_ids, \
+                f"Dimension {dimension_id} must be in data!"
+        values = {
+            dimension_id: [value] if isinstance(value, str) else list(value)
+            for dimension_id, value in dimension_values.items()
+        }
+        data = copy.copy(self)
+        data._dataframe = self._dataframe[
+            self._get_mask(self._dataframe, values)
+        ].reset_index(drop=True)
+        data._clear_caches()
+        return data
+
+    def _rows_at(self, time_value: str) -> pd.DataFrame:
+        df = self._dataframe[self._dataframe['time'] == time_value]
+        return df.astype(str).sort_values(self.dimension_ids).reset_index(
+            drop=True
         )
-        status_values = self._get_status_values(observation_ids)
-        observation_values = self._get_observation_values(observation_ids)
-        dataframe_data = self._get_dataframe_data(
-            dimension_values, status_values, observation_values
+
+    def has_same_values_at(self, other: 'SdmxData', time_value: str) -> bool:
+        # Whether both have the same observations and statuses at
+        # `time_value`, e.g. to detect revisions of the overlapping period
+        # of an incremental update.
+        return (
+            self.dimension_ids == other.dimension_ids
+            and self._rows_at(time_value).equals(other._rows_at(time_value))
         )
-        index_dataframe_data = self._get_dataframe_data(
-            dimension_indices, status_values, observation_values
+
+    def merge(self, other: 'SdmxData', time_value: str) -> 'SdmxData':
+        # The observations of this data before `time_value` and all
+        # observations of `other`, which has the newer metadata.
+        assert self.dimension_ids == other.dimension_ids, \
+            "Both data must have the same dimensions!"
+
+        dimension_value_labels = {
+            dimension_id: {
+                **self._dimension_value_labels[dimension_id],
+                **other._dimension_value_labels[dimension_id]
+            }
+            for dimension_id in self.dimension_ids
+        }
+        old = self._dataframe[
+            self._dataframe['time'].astype(str).to_numpy() < time_value
+        ]
+        new = other._dataframe
+        data: Dict[str, Any] = {}
+        for dimension_id in self.dimension_ids:
+            # The categories stay in the order of the labels
+            data[dimension_id] = pd.Categorical(
+                np.concatenate([
+                    old[dimension_id].astype(str).to_numpy(),
+                    new[dimension_id].astype(str).to_numpy()
+                ]),
+                categories=list(dimension_value_labels[dimension_id])
+            )
+        data['status'] = pd.Categorical(np.concatenate([
+            old['status'].astype(str).to_numpy(),
+            new['status'].astype(str).to_numpy()
+        ]))
+        data['observation'] = np.concatenate([
+            old['observation'].to_numpy(), new['observation'].to_numpy()
+        ])
+
+        annotations = {**self._annotations, **other._annotations}
+        if 'OBS_COUNT' in annotations:
+            annotations['OBS_COUNT'] = str(len(data['observation']))
+        for key, select_period in (
+            ('OBS_PERIOD_OVERALL_OLDEST', min),
+            ('OBS_PERIOD_OVERALL_LATEST', max)
+        ):
+            periods = [
+                annotations_[key]
+                for annotations_ in (self._annotations, other._annotations)
+                if annotations_.get(key) is not None
+            ]
+            if periods:
+                annotations[key] = select_period(periods)
+
+        metadata = {
+            **other._get_metadata(),
+            'annotations': annotations,
+            'data_shape': [
+                len(dimension_value_labels[dimension_id])
+                for dimension_id in self.dimension_ids
+            ],
+            'dimension_value_labels': dimension_value_labels,
+            'status_labels': {**self._status_labels, **other._status_labels}
+        }
+        return self.from_dataframe(
+            pd.DataFrame(data), metadata, self._none_value
         )
 
-        df = pd.DataFrame(
-            dataframe_data, columns=self.dataframe_columns
+    def _get_lookup_index(
+        self, dimension_ids: Tuple[str, ...]
+    ) -> Dict[Tuple[str, ...], int]:
+        # Maps the values of the given dimensions to the position of the
+        # first observation with these values. Built once per combination
+        # of dimensions.
+        if dimension_ids not in self._lookup_indices:
+            is_first = ~self._dataframe.duplicated(
+                subset=list(dimension_ids)
+            ).to_numpy()
+            columns = [
+                self._dataframe[dimension_id].to_numpy()[is_first]
+                for dimension_id in dimension_ids
+            ]
+            self._lookup_indices[dimension_ids] = dict(
+                zip(zip(*columns), np.flatnonzero(is_first))
+            )
+        return self._lookup_indices[dimension_ids]
+
+    def get_observation(
+        self, dimension_values: Dict[str, str]
+    ) -> Tuple[str, float] | None:
+        # Returns (status, observation) of the first observation with the
+        # given dimension values or None if there is no such observation.
+        dimension_ids = tuple(sorted(dimension_values))
+        position = self._get_lookup_index(dimension_ids).get(
+            tuple(dimension_values[d_id] for d_id in dimension_ids)
         )
-        df['status'] = df.groupby(
-            [c for c in list(df.columns) if c != 'status']
-        )['status'].transform(lambda x: "".join(set("".join(x))))
-        df = df.drop_duplicates()
-        self._dataframe = df
-
-        df = pd.DataFrame(
-            index_dataframe_data, columns=self.dataframe_columns
+        if position is None:
+            return None
+        return (
+            self._dataframe['status'].iat[position],
+            self._dataframe['observation'].iat[position]
         )
-        df['status'] = df.groupby(
-            [c for c in list(df.columns) if c != 'status']
-        )['status'].transform(lambda x: "".join(set("".join(x))))
-        df = df.drop_duplicates()
-        self._index_dataframe = df
-
-    def _get_pivot_table(
-        self, dimension_values: Dict[str, str], value_column: str
+
+    def get_observations(
+        self, geos: List[str], dimension_values: Dict[str, str]
+    ) -> List[Tuple[str, float] | None]:
+        return [
+            self.get_observation({**dimension_values, 'geo': geo})
+            for geo in geos
+        ]
+
+    def _get_period_ranks(self) -> np.ndarray:
+        # Position of every time category in `periods`
+        categories = np.array(self._dataframe['time'].cat.categories, dtype=str)
+        ranks = np.empty(len(categories), dtype=np.int64)
+        ranks[np.argsort(categories, kind='stable')] = np.arange(len(categories))
+        return ranks
+
+    def get_values_at(
+        self,
+        time: str,
+        dimension_values: Dict[str, str] | None = None,
+        exact: bool = False
     ) -> pd.DataFrame:
+        # Returns one row per geo with the time, status and observation of
+        # the latest observation at or before `time` (or exactly at `time`
+        # if `exact`). Geos without such an observation are left out.
+        mask = self._get_mask(self._dataframe, {
+            dimension_id: [value]
+            for dimension_id, value in (dimension_values or {}).items()
+        })
+        periods = self.periods
+        time_rank = (
+            np.searchsorted(periods, time, side='right') - 1
+            if time is not None
+            else -1
+        )
+        row_ranks = self._get_period_ranks()[
+            self._dataframe['time'].cat.codes.to_numpy()
+        ]
+        if exact:
+            is_time = time_rank >= 0 and periods[time_rank] == time
+            mask &= (row_ranks == time_rank) & is_time
+        else:
+            mask &= row_ranks <= time_rank
+
+        # Sorted by geo and period, the last row of each geo is the latest.
+        # Of several rows with the same period the first one is used.
+        rows = np.flatnonzero(mask)
+        geo_codes = self._dataframe['geo'].cat.codes.to_numpy()[rows]
+        order = np.lexsort((-rows, row_ranks[rows], geo_codes))
+        rows, geo_codes = rows[order], geo_codes[order]
+        is_latest = np.ones(len(rows), dtype=bool)
+        is_latest[:-1] = geo_codes[1:] != geo_codes[:-1]
+        rows = rows[is_latest]
+
+        return pd.DataFrame(
+            {
+                'time': self._dataframe['time'].to_numpy()[rows],
+                'status': self._dataframe['status'].to_numpy()[rows],
+                'observation': self._dataframe['observation'].to_numpy()[rows]
+            },
+            index=pd.Index(
+                self._dataframe['geo'].to_numpy()[rows], dtype=object, name='geo'
+            )
+        )
+
+    def to_cube(self, dense: bool | None = None) -> SdmxCube:
+        # The cube is dense unless the dataset is too sparse or too large,
+        # `dense` forces one of the two forms.
+        if dense not in self._cubes:
+            coordinates = np.column_stack([
+                self._dataframe[dimension_id].cat.codes.to_numpy()
+                for dimension_id in self.dimension_ids
+            ])
+            self._cubes[dense] = SdmxCube(
+                dimension_ids=self.dimension_ids,
+                dimension_values=[
+                    np.array(self._dataframe[dimension_id].cat.categories)
+                    for dimension_id in self.dimension_ids
+                ],
+                coordinates=coordinates.astype(np.int64),
+                observations=self._dataframe['observation'].to_numpy(),
+                statuses=self._dataframe['status'].array,
+                no_status=self.NO_STATUS,
+                dense=dense
+            )
+        return self._cubes[dense]
+
+    def _construct_pivot_tables(
+        self, dimension_values: Dict[str, str]
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        mask = self._get_mask(self._dataframe, {
+            dimension_id: [value]
+            for dimension_id, value in dimension_values.items()
+        })
+        geo_values, geo_positions = np.unique(
+            self._dataframe['geo'].to_numpy()[mask].astype(str),
+            return_inverse=True
+        )
+        time_values, time_positions = np.unique(
+            self._dataframe['time'].to_numpy()[mask].astype(str),
+            return_inverse=True
+        )
+        cells = geo_positions * len(time_values) + time_positions
+        if len(np.unique(cells)) < len(cells):
+            raise ValueError(
+                "geo and time do not identify the observations, "
+                "dimension_values must contain all other dimensions!"
+            )
+
+        shape = (len(geo_values), len(time_values))
+        observations = np.full(shape, np.nan)
+        observations[geo_positions, time_positions] = (
+            self._dataframe['observation'].to_numpy()[mask]
+        )
+        statuses = np.full(shape, self.NO_STATUS, dtype=object)
+        statuses[geo_positions, time_positions] = (
+            self._dataframe['status'].to_numpy()[mask]
+        )
+
+        index = pd.Index(geo_values, dtype=object, name='geo')
+        columns = pd.Index(time_values, dtype=object, name='time')
+        return (
+            pd.DataFrame(observations, index=index, columns=columns),
+            pd.DataFrame(statuses, index=index, columns=columns)
+        )
+
+    def get_pivot_tables(
+        self, dimension_values: Dict[str, str]
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        # Returns the geo x time tables of the observations and of their
+        # statuses. Both are built together and cached per slice.
         assert 'time' not in dimension_values, \
             "time must not be in dimension_values!"
         assert 'geo' not in dimension_values, \
             "geo must not be in dimension_values!"
 
-        dimension_ids_to_drop = self.dimension_ids[:]
-        dimension_ids_to_drop.remove('time')
-        dimension_ids_to_drop.remove('geo')
-
-        df = self.dataframe.copy()
-        for dimension_id, value in dimension_values.items():
-            df = df[df[dimension_id] == value]
-
-        columns_to_drop = dimension_ids_to_drop + [
-            'status' if value_column == 'observation' else 'observation'
-        ]
-        df = df.drop(columns=columns_to_drop)
-
-        return df.pivot(
-            index='geo', columns='time', values=value_column
-        ).fillna(self._none_value)
+        key = tuple(sorted(dimension_values.items()))
+        if key not in self._pivot_tables:
+            self._pivot_tables[key] = self._construct_pivot_tables(
+                dimension_values
+            )
+        return self._pivot_tables[key]
 
     def get_pivot_table(
         self, dimension_values: Dict[str, str]
     ) -> pd.DataFrame:
-        return self._get_pivot_table(dimension_values, 'observation')
+        return self.get_pivot_tables(dimension_values)[0]
 
     def get_status_pivot_table(
         self, dimension_values: Dict[str, str]
     ) -> pd.DataFrame:
-        return self._get_pivot_table(dimension_values, 'status')
+        return self.get_pivot_tables(dimension_values)[1]
 
-    def get_latest_time_value_with(
+    def _get_latest_time_value_with(
         self,
         fill_level: float,
         dimension_values: Dict[str, str]
-    ) -> str:
-        df = self._dataframe.copy()
-        for dimension_id, value in dimension_values.items():
-            df = df[df[dimension_id] == value]
-        time_values = set(df['time'])
-
-        max_count = 0
-        for time_value in time_values:
-            max_count = max(
-                max_count,
-                df[df['time'] == time_value]['observation'].count()
-            )
+    ) -> str | None:
+        mask = self._get_mask(self._dataframe, {
+            dimension_id: [value]
+            for dimension_id, value in dimension_values.items()
+        })
+        time = self._dataframe['time']
+        counts = np.bincount(
+            time.cat.codes.to_numpy()[mask],
+            minlength=len(time.cat.categories)
+        )
+        if counts.max(initial=0) == 0:
+            return None
 
-        for time_value in reversed(sorted(time_values)):
-            count = df[df['time'] == time_value]['observation'].count()
-            if count / max_count >= fill_level:
-                return time_value
+        # The latest time with enough observations compared to the time with
+        # the most observations
+        time_values = time.cat.categories[
+            (counts > 0) & (counts / counts.max() >= fill_level)
+        ]
+        return max(time_values) if len(time_values) > 0 else None
 
-        return None
+    def get_latest_time_value_with(
+        self,
+        fill_level: float,
+        dimension_values: Dict[str, str]
+    ) -> str | None:
+        key = (fill_level, tuple(sorted(dimension_values.items())))
+        if key not in self._latest_time_values:
+            self._latest_time_values[key] = self._get_latest_time_value_with(
+                fill_level, dimension_values
+            )
+        return self._latest_time_values[key]
 
     @property
     def updated(self) -> dt.datetime:
         return self._updated
 
+    @property
+    def periods(self) -> np.ndarray:
+        # All periods of the dataset in chronological order. Eurostat periods
+        # of the same frequency (e.g. 2020, 2020-Q1, 2020-01) sort as text.
+        return np.sort(
+            np.array(self._dataframe['time'].cat.categories, dtype=str)
+        )
+
+    @property
+    def observed_periods(self) -> np.ndarray:
+        # The periods that have at least one observation (`periods` also
+        # contains periods that were removed by `select`)
+        time = self._dataframe['time']
+        return np.sort(np.array(
+            time.cat.categories[np.unique(time.cat.codes[time.cat.codes >= 0])],
+            dtype=str
+        ))
+
     @property
     def dimension_ids(self) -> List[str]:
-        return self._json_data['id']
+        return self._dimension_ids
 
     @property
     def dataframe_columns(self) -> List[str]:
         return self.dimension_ids + ['status', 'observation']
 
     @property
-    def data_shape(self) -> Tuple[int]:
-        return tuple(self._json_data['size'])
+    def data_shape(self) -> Tuple[int, ...]:
+        return self._data_shape
 
     @property
     def dimension_labels(self) -> Dict[str, str]:
-        return {
-            d_id: self._json_data['dimension'][d_id]['label']
-            for d_id in self.dimension_ids
-        }
+        return self._dimension_labels
 
     @property
     def dimension_value_labels(self) -> Dict[str, Dict[str, str]]:
-        dimension_data = self._json_data['dimension']
-        return {
-            d_id: {
-                value: dimension_data[d_id]['category']['label'][value]
-                for value in dimension_data[d_id]['category']['index']
-            }
-            for d_id in self.dimension_ids
-        }
+        return self._dimension_value_labels
 
     @property
     def language(self) -> str:
-        return self._json_data['extension']['lang'].lower()
+        return self._language
 
     @property
     def observation_count(self) -> int:
@@ -257,17 +761,29 @@ class SdmxData:
 
     @property
     def status_labels(self) -> Dict[str, str]:
-        if 'status' not in self._json_data:
-            return {}
-        return {
-            status: self._json_data['extension']['status']['label'][status]
-            for status in self._json_data['extension']['status']['label']
-        }
+        return self._status_labels
 
     @property
     def dataframe(self) -> pd.DataFrame:
         return self._dataframe
 
+    @property
+    def string_dataframe(self) -> pd.DataFrame:
+        # All values as strings with `none_value` for missing observations
+        # and statuses, as the dataframe was stored before it was typed.
+        df = self._dataframe.astype({
+            dimension_id: str for dimension_id in self.dimension_ids
+        })
+        df['status'] = (
+            df['status'].astype(str).replace(self.NO_STATUS, self._none_value)
+        )
+        df['observation'] = df['observation'].astype(object).where(
+            df['observation'].notna(), self._none_value
+        ).astype(str)
+        return df
+
     @property
     def index_dataframe(self) -> pd.DataFrame:
+        if self._index_dataframe is None:
+            self._construct_index_dataframe()
         return self._index_dataframe
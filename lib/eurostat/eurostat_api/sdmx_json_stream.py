@@ -0,0 +1,268 @@
+import codecs
+import json
+import re
+from typing import Any, Dict, Iterable, Tuple
+
+import numpy as np
+
+
+class GrowableArray:
+
+    _array: np.ndarray
+    _length: int
+
+    def __init__(self, dtype: Any, capacity: int = 1024):
+        self._array = np.empty(capacity, dtype=dtype)
+        self._length = 0
+
+    def extend(self, values: np.ndarray):
+        required = self._length + len(values)
+        if required > len(self._array):
+            capacity = max(required, 2 * len(self._array))
+            array = np.empty(capacity, dtype=self._array.dtype)
+            array[:self._length] = self._array[:self._length]
+            self._array = array
+        self._array[self._length:required] = values
+        self._length = required
+
+    @property
+    def array(self) -> np.ndarray:
+        return self._array[:self._length]
+
+
+class SdmxJsonStreamParser:
+
+    # The SDMX-JSON objects that hold one entry per observation. They are
+    # flat objects mapping the flat index to a number or a string, e.g.
+    # {"0": 1.5, "3": 2.0}, and are parsed piecewise into arrays. All other
+    # members of the document are small and decoded as a whole.
+    OBSERVATION_KEYS: Tuple[str, ...] = ('value', 'status')
+
+    # Complete entries of such an object, each followed by a ',' ...
+    ENTRIES: re.Pattern = re.compile(
+        r'(?:\s*"(?:[^"\\]|\\.)*"\s*:\s*(?:"(?:[^"\\]|\\.)*"|[^,}"\s]+)\s*,)*'
+    )
+    # ... and the last entry (if any) followed by the closing '}'
+    LAST_ENTRY: re.Pattern = re.compile(
+        r'(?:\s*"(?:[^"\\]|\\.)*"\s*:\s*(?:"(?:[^"\\]|\\.)*"|[^,}"\s]+))?\s*}'
+    )
+
+    class States:
+        START: str = 'start'
+        KEY: str = 'key'
+        COLON: str = 'colon'
+        MEMBER: str = 'member'
+        OBSERVATIONS_START: str = 'observations_start'
+        OBSERVATIONS: str = 'observations'
+        END: str = 'end'
+
+    _decoder: json.JSONDecoder
+    _text_decoder: codecs.IncrementalDecoder
+    _buffer: str
+    _position: int
+    _state: str
+    _key: str | None
+    _json_data: Dict[str, Any]
+    _ids: Dict[str, GrowableArray]
+    _values: GrowableArray
+    # Statuses are stored as codes of the few distinct status strings
+    _status_codes: GrowableArray
+    _status_categories: Dict[str, int]
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ""
+        self._position = 0
+        self._state = self.States.START
+        self._key = None
+        self._json_data = {}
+        self._ids = {
+            'value': GrowableArray(np.int64),
+            'status': GrowableArray(np.int64)
+        }
+        self._values = GrowableArray(np.float64)
+        self._status_codes = GrowableArray(np.int32)
+        self._status_categories = {}
+
+    def _skip_whitespace(self):
+        while (
+            self._position < len(self._buffer)
+            and self._buffer[self._position] in ' \t\n\r'
+        ):
+            self._position += 1
+
+    def _next_character(self) -> str | None:
+        self._skip_whitespace()
+        if self._position >= len(self._buffer):
+            return None
+        return self._buffer[self._position]
+
+    def _decode(self, is_final: bool) -> Tuple[Any, bool]:
+        # Returns the json value at the current position and whether it is
+        # complete. A number at the end of the buffer might be cut off, so
+        # it only counts as complete if something follows it.
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._position)
+        except json.JSONDecodeError:
+            if is_final:
+                raise
+            return None, False
+        if end == len(self._buffer) and not is_final:
+            return None, False
+        self._position = end
+        return value, True
+
+    def _add_observations(self, key: str, text: str):
+        observations = json.loads(f"{{{text}}}")
+        self._ids[key].extend(np.fromiter(
+            map(int, observations.keys()),
+            dtype=np.int64,
+            count=len(observations)
+        ))
+        if key == 'value':
+            self._values.extend(
+                np.array(list(observations.values()), dtype=np.float64)
+            )
+        else:
+            self._status_codes.extend(np.fromiter(
+                (
+                    self._status_categories.setdefault(
+                        status, len(self._status_categories)
+                    )
+                    for status in observations.values()
+                ),
+                dtype=np.int32,
+                count=len(observations)
+            ))
+
+    def _parse_observations(self) -> bool:
+        # Parses all complete entries in the buffer and returns whether the
+        # end of the object was reached.
+        entries = self.ENTRIES.match(self._buffer, self._position)
+        last_entry = self.LAST_ENTRY.match(self._buffer, entries.end())
+        if last_entry is not None:
+            self._add_observations(
+                self._key, self._buffer[self._position:last_entry.end() - 1]
+            )
+            self._position = last_entry.end()
+            return True
+        if entries.end() > self._position:
+            self._add_observations(
+                self._key, self._buffer[self._position:entries.end() - 1]
+            )
+            self._position = entries.end()
+        return False
+
+    def _parse(self, is_final: bool):
+        States = self.States
+        while True:
+            if self._state == States.OBSERVATIONS:
+                if not self._parse_observations():
+                    return
+                self._state = States.KEY
+                continue
+
+            character = self._next_character()
+            if character is None:
+                return
+
+            if self._state == States.START:
+                if character != '{':
+                    raise ValueError("SDMX-JSON must be an object!")
+                self._position += 1
+                self._state = States.KEY
+            elif self._state == States.KEY:
+                if character == ',':
+                    self._position += 1
+                elif character == '}':
+                    self._position += 1
+                    self._state = States.END
+                else:
+                    key, is_complete = self._decode(is_final)
+                    if not is_complete:
+                        return
+                    self._key = key
+                    self._state = States.COLON
+            elif self._state == States.COLON:
+                if character != ':':
+                    raise ValueError(f"Expected ':' after {self._key}!")
+                self._position += 1
+                self._state = (
+                    States.OBSERVATIONS_START
+                    if self._key in self.OBSERVATION_KEYS
+                    else States.MEMBER
+                )
+            elif self._state == States.OBSERVATIONS_START:
+                if character != '{':
+                    # Observations given as an array are decoded as a whole
+                    self._state = States.MEMBER
+                    continue
+                self._position += 1
+                self._json_data[self._key] = {}
+                self._state = States.OBSERVATIONS
+            elif self._state == States.MEMBER:
+                value, is_complete = self._decode(is_final)
+                if not is_complete:
+                    return
+                self._json_data[self._key] = value
+                self._state = States.KEY
+            elif self._state == States.END:
+                raise ValueError("Unexpected data after SDMX-JSON!")
+
+    def _compact(self):
+        # Drops everything that has been parsed already
+        self._buffer = self._buffer[self._position:]
+        self._position = 0
+
+    def feed(self, chunk: bytes):
+        self._buffer += self._text_decoder.decode(chunk)
+        self._parse(is_final=False)
+        self._compact()
+
+    def close(self):
+        self._buffer += self._text_decoder.decode(b"", final=True)
+        self._parse(is_final=True)
+        self._compact()
+        if self._state != self.States.END:
+            raise ValueError("SDMX-JSON ended unexpectedly!")
+
+    def parse(self, chunks: Iterable[bytes]) -> 'SdmxJsonStreamParser':
+        for chunk in chunks:
+            self.feed(chunk)
+        self.close()
+        return self
+
+    def _observation_arrays(self, key: str) -> Tuple[np.ndarray, np.ndarray]:
+        data = self._json_data.get(key)
+        dtype = np.float64 if key == 'value' else object
+        if isinstance(data, list):
+            # Observations given as an array instead of an object
+            ids = np.array(
+                [i for i, value in enumerate(data) if value is not None],
+                dtype=np.int64
+            )
+            values = np.empty(len(ids), dtype=dtype)
+            values[:] = [value for value in data if value is not None]
+            return ids, values
+        if key == 'value':
+            return self._ids[key].array, self._values.array
+        categories = np.empty(len(self._status_categories), dtype=object)
+        categories[:] = list(self._status_categories)
+        return self._ids[key].array, categories[self._status_codes.array]
+
+    @property
+    def json_data(self) -> Dict[str, Any]:
+        # The document without the observations
+        return {
+            key: {} if key in self.OBSERVATION_KEYS else value
+            for key, value in self._json_data.items()
+        }
+
+    @property
+    def values(self) -> Tuple[np.ndarray, np.ndarray]:
+        return self._observation_arrays('value')
+
+    @property
+    def statuses(self) -> Tuple[np.ndarray, np.ndarray]:
+        return self._observation_arrays('status')
@@ -0,0 +1,206 @@
+import os
+import threading
+import time
+from typing import Any, Dict
+
+import requests
+
+from lib.network.transport import (
+    Transport, get_transport, key_filename, read_meta, read_response,
+    request_key, tee_response, write_meta, write_response
+)
+
+# A persistent response cache that sits on top of the current transport.
+# Responses are keyed by the full url (including the query parameters) and
+# the `Accept-Language` header. Within `ttl` seconds a stored response is
+# served without asking the server. After that the request is revalidated
+# with `If-None-Match`/`If-Modified-Since`, so an unchanged document only
+# costs a 304 without payload. The directory is kept below `max_size` bytes
+# by evicting the least recently used entries. Streamed responses
+# (`stream=True`) are passed on unread and stored while the caller reads
+# them.
+
+DEFAULT_CACHE_DIRECTORY: str = os.path.join(".cache", "http")
+DEFAULT_TTL: float = 12 * 60 * 60.0  # s
+DEFAULT_MAX_SIZE: int = 512 * 1024 * 1024  # bytes
+
+
+class CachingTransport(Transport):
+
+    _directory: str
+    _ttl: float
+    _max_size: int
+    _inner: Transport | None
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        directory: str = DEFAULT_CACHE_DIRECTORY,
+        ttl: float = DEFAULT_TTL,
+        max_size: int = DEFAULT_MAX_SIZE,
+        inner: Transport | None = None
+    ):
+        self._directory = directory
+        self._ttl = ttl
+        self._max_size = max_size
+        self._inner = inner
+        self._lock = threading.Lock()
+        os.makedirs(self._directory, exist_ok=True)
+
+    @property
+    def inner(self) -> Transport:
+        # Without an explicit inner transport the global one is used, so
+        # `set_transport` (e.g. record/replay) also applies below the cache.
+        return self._inner or get_transport()
+
+    def _is_fresh(self, meta: Dict[str, Any], max_age: float | None) -> bool:
+        ttl = self._ttl if max_age is None else min(self._ttl, max_age)
+        return time.time() - meta['stored_at'] < ttl
+
+    @staticmethod
+    def _validators(meta: Dict[str, Any]) -> Dict[str, str]:
+        headers = requests.structures.CaseInsensitiveDict(meta['headers'])
+        validators = {}
+        if 'ETag' in headers:
+            validators['If-None-Match'] = headers['ETag']
+        if 'Last-Modified' in headers:
+            validators['If-Modified-Since'] = headers['Last-Modified']
+        return validators
+
+    @staticmethod
+    def _read_response(
+        filename: str, meta: Dict[str, Any]
+    ) -> requests.Response | None:
+        # The body can be evicted by another thread after the metadata was
+        # read, which counts as a miss
+        try:
+            return read_response(filename, meta)
+        except FileNotFoundError:
+            return None
+
+    def _touch(self, filename: str):
+        try:
+            os.utime(f"{filename}.json")
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        entries = []
+        total_size = 0
+        with os.scandir(self._directory) as iterator:
+            for entry in iterator:
+                if not entry.name.endswith('.json'):
+                    continue
+                filename = entry.path[:-len('.json')]
+                try:
+                    size = os.path.getsize(f"{filename}.body")
+                    accessed = entry.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                entries.append((accessed, size, filename))
+                total_size += size
+
+        entries.sort()
+        for _, size, filename in entries:
+            if total_size <= self._max_size:
+                break
+            for suffix in ('.json', '.body'):
+                try:
+                    os.remove(f"{filename}{suffix}")
+                except FileNotFoundError:
+                    pass
+            total_size -= size
+
+    def _store(
+        self, filename: str, key: Dict[str, Any], response: requests.Response
+    ):
+        with self._lock:
+            write_response(filename, key, response, stored_at=time.time())
+            self._evict()
+
+    def _evict_locked(self):
+        with self._lock:
+            self._evict()
+
+    def get(
+        self, url: str, max_age: float | None = None, **kwargs
+    ) -> requests.Response:
+        # `max_age` (in seconds) shortens the ttl for this request. With
+        # `max_age=0` a stored response is always revalidated, e.g. to learn
+        # whether a document changed.
+        key = request_key(url, **kwargs)
+        filename = key_filename(self._directory, key)
+        meta = read_meta(filename)
+
+        if meta is not None and self._is_fresh(meta, max_age):
+            cached_response = self._read_response(filename, meta)
+            if cached_response is not None:
+                self._touch(filename)
+                return cached_response
+            meta = None
+
+        request_kwargs = kwargs
+        if meta is not None:
+            request_kwargs = {
+                **kwargs,
+                'headers': {
+                    **(kwargs.get('headers') or {}),
+                    **self._validators(meta)
+                }
+            }
+        response = self.inner.get(url, **request_kwargs)
+
+        if response.status_code == 304 and meta is not None:
+            cached_response = self._read_response(filename, meta)
+            if cached_response is not None:
+                cached_response.headers.update({
+                    name: value
+                    for name, value in response.headers.items()
+                    if name.lower() in (
+                        'etag', 'last-modified', 'date', 'expires'
+                    )
+                })
+                # The body is unchanged, only the metadata is renewed
+                with self._lock:
+                    write_meta(
+                        filename, key, cached_response, stored_at=time.time()
+                    )
+                return cached_response
+            # Evicted since the metadata was read, so the body is requested
+            # again without validators
+            response.close()
+            response = self.inner.get(url, **kwargs)
+
+        if response.status_code == 200:
+            if kwargs.get('stream', False):
+                # Stored while the caller reads the body
+                return tee_response(
+                    filename, key, response, self._evict_locked,
+                    stored_at=time.time()
+                )
+            self._store(filename, key, response)
+        return response
+
+    def clear(self):
+        with self._lock:
+            for name in os.listdir(self._directory):
+                os.remove(os.path.join(self._directory, name))
+
+
+_cached_transport: CachingTransport | None = None
+_cached_transport_lock: threading.Lock = threading.Lock()
+
+
+def get_cached_transport() -> CachingTransport:
+    global _cached_transport
+    if _cached_transport is None:
+        with _cached_transport_lock:
+            if _cached_transport is None:
+                _cached_transport = CachingTransport()
+    return _cached_transport
+
+
+def set_cached_transport(transport: CachingTransport):
+    global _cached_transport
+    with _cached_transport_lock:
+        _cached_transport = transport
@@ -0,0 +1,111 @@
+import ssl
+import sys
+import threading
+
+import requests
+import urllib3
+
+# The Eurostat servers still use legacy TLS renegotiation, which OpenSSL on
+# Linux refuses by default. Everything that talks to Eurostat or the OECD goes
+# through the session returned by `get_session`, so the SSL context (and the
+# CA bundle it loads) is created once per process and all requests share one
+# keep-alive connection pool instead of paying a fresh TCP and TLS handshake
+# per call.
+
+IS_LINUX: bool = 'linux' in sys.platform.lower()
+
+POOL_CONNECTIONS: int = 4  # number of hosts kept in the pool
+POOL_MAXSIZE: int = 16  # connections kept alive per host
+POOL_BLOCK: bool = False
+
+
+class LegacyHttpAdapter(requests.adapters.HTTPAdapter):
+    '''
+    Transport adapter that passes a custom ssl_context to urllib3.
+    https://stackoverflow.com/questions/71603314/ssl-error-unsafe-legacy-renegotiation-disabled/71646353#71646353
+    '''
+
+    _ssl_context: ssl.SSLContext | None
+
+    def __init__(self, ssl_context: ssl.SSLContext | None = None, **kwargs):
+        self._ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(
+        self, connections: int, maxsize: int,
+        block: bool = False, **pool_kwargs
+    ):
+        if self._ssl_context is not None:
+            pool_kwargs['ssl_context'] = self._ssl_context
+        self.poolmanager = urllib3.poolmanager.PoolManager(
+            num_pools=connections, maxsize=maxsize,
+            block=block, **pool_kwargs
+        )
+
+
+def create_legacy_ssl_context() -> ssl.SSLContext:
+    context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
+    context.options |= 0x4  # OP_LEGACY_SERVER_CONNECT
+    return context
+
+
+_lock: threading.Lock = threading.Lock()
+_adapter: requests.adapters.HTTPAdapter | None = None
+_local: threading.local = threading.local()
+
+
+def _create_adapter() -> requests.adapters.HTTPAdapter:
+    return LegacyHttpAdapter(
+        create_legacy_ssl_context() if IS_LINUX else None,
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        pool_block=POOL_BLOCK
+    )
+
+
+def get_adapter() -> requests.adapters.HTTPAdapter:
+    global _adapter
+    if _adapter is None:
+        with _lock:
+            if _adapter is None:
+                _adapter = _create_adapter()
+    return _adapter
+
+
+def get_session() -> requests.Session:
+    '''
+    Returns the session of the calling thread. `requests.Session` itself is
+    not thread safe, so every thread gets its own session, but all sessions
+    share the same adapter and therefore the same connection pool.
+    '''
+    adapter = get_adapter()
+    session = getattr(_local, 'session', None)
+    if session is None or getattr(_local, 'adapter', None) is not adapter:
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _local.session = session
+        _local.adapter = adapter
+    return session
+
+
+def configure(
+    pool_connections: int | None = None,
+    pool_maxsize: int | None = None,
+    pool_block: bool | None = None
+):
+    '''
+    Changes the pool settings. The current pool is closed and a new one is
+    created on the next request.
+    '''
+    global _adapter, POOL_CONNECTIONS, POOL_MAXSIZE, POOL_BLOCK
+    with _lock:
+        if pool_connections is not None:
+            POOL_CONNECTIONS = pool_connections
+        if pool_maxsize is not None:
+            POOL_MAXSIZE = pool_maxsize
+        if pool_block is not None:
+            POOL_BLOCK = pool_block
+        if _adapter is not None:
+            _adapter.close()
+        _adapter = None
@@ -0,0 +1,283 @@
+import hashlib
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterator, List
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from lib.network.session import get_session
+
+# All HTTP traffic of the libraries (Eurostat and OECD) goes through the
+# transport returned by `get_transport`. By default this is a
+# `LiveTransport`. For offline runs and reproducible benchmarks a
+# `RecordReplayTransport` can be installed with `set_transport`, or selected
+# through the environment variables `B14_TRANSPORT` ("live", "record",
+# "replay" or "auto") and `B14_CASSETTE_DIRECTORY`.
+
+TRANSPORT_VARIABLE: str = "B14_TRANSPORT"
+CASSETTE_DIRECTORY_VARIABLE: str = "B14_CASSETTE_DIRECTORY"
+DEFAULT_CASSETTE_DIRECTORY: str = ".cassettes"
+
+# Upper limit of simultaneous requests to one host, no matter how many
+# threads are fetching
+MAX_REQUESTS_PER_HOST: int = 6
+
+
+class Transport(ABC):
+
+    @abstractmethod
+    def get(self, url: str, **kwargs) -> requests.Response:
+        raise NotImplementedError("@abstractmethod")
+
+
+class LiveTransport(Transport):
+
+    _max_requests_per_host: int
+    _host_semaphores: Dict[str, threading.BoundedSemaphore]
+    _lock: threading.Lock
+
+    def __init__(self, max_requests_per_host: int | None = None):
+        self._max_requests_per_host = (
+            max_requests_per_host or MAX_REQUESTS_PER_HOST
+        )
+        self._host_semaphores = {}
+        self._lock = threading.Lock()
+
+    def _host_semaphore(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.BoundedSemaphore(
+                    self._max_requests_per_host
+                )
+            return self._host_semaphores[host]
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        with self._host_semaphore(url):
+            return get_session().get(url=url, **kwargs)
+
+
+# Only these request headers change the response and are part of the key
+KEY_HEADERS: List[str] = ['Accept', 'Accept-Language']
+# Conditional request headers, e.g. of a `CachingTransport` above
+VALIDATOR_HEADERS: List[str] = ['If-None-Match', 'If-Modified-Since']
+
+
+def request_key(url: str, **kwargs) -> Dict[str, Any]:
+    prepared_url = requests.Request(
+        'GET', url, params=kwargs.get('params')
+    ).prepare().url
+    headers = CaseInsensitiveDict(kwargs.get('headers') or {})
+    return {
+        'url': prepared_url,
+        'headers': {
+            name: headers[name]
+            for name in KEY_HEADERS
+            if name in headers
+        }
+    }
+
+
+def key_filename(directory: str, key: Dict[str, Any]) -> str:
+    digest = hashlib.sha256(
+        json.dumps(key, sort_keys=True).encode('utf-8')
+    ).hexdigest()
+    return os.path.join(directory, digest)
+
+
+def write_meta(
+    filename: str,
+    key: Dict[str, Any],
+    response: requests.Response,
+    **extra
+):
+    meta = {
+        'request': key,
+        'url': response.url,
+        'status_code': response.status_code,
+        'reason': response.reason,
+        'encoding': response.encoding,
+        'headers': dict(response.headers),
+        **extra
+    }
+    suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(f"{filename}.json{suffix}", 'w', encoding='utf-8') as file:
+        json.dump(meta, file, indent=4)
+    os.replace(f"{filename}.json{suffix}", f"{filename}.json")
+
+
+def write_response(
+    filename: str,
+    key: Dict[str, Any],
+    response: requests.Response,
+    **extra
+):
+    # The body is written first and both files are replaced atomically, so a
+    # reader never sees metadata without its body.
+    suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(f"{filename}.body{suffix}", 'wb') as file:
+        file.write(response.content)
+    os.replace(f"{filename}.body{suffix}", f"{filename}.body")
+    write_meta(filename, key, response, **extra)
+
+
+def tee_response(
+    filename: str,
+    key: Dict[str, Any],
+    response: requests.Response,
+    on_stored: Callable[[], None] | None = None,
+    **extra
+) -> requests.Response:
+    # Like `write_response` for a streamed response: the body is written
+    # while the caller reads it with `iter_content` (or `content`). Only a
+    # completely read body is stored, the metadata is written last.
+    iter_content = response.iter_content
+
+    def iter_and_write_content(
+        chunk_size: int | None = 1, decode_unicode: bool = False
+    ) -> Iterator[bytes]:
+        if decode_unicode:
+            yield from iter_content(chunk_size, decode_unicode)
+            return
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(f"{filename}.body{suffix}", 'wb') as file:
+                for chunk in iter_content(chunk_size):
+                    file.write(chunk)
+                    yield chunk
+        except BaseException:
+            # Also if the caller stops reading (`GeneratorExit`)
+            try:
+                os.remove(f"{filename}.body{suffix}")
+            except FileNotFoundError:
+                pass
+            raise
+        os.replace(f"{filename}.body{suffix}", f"{filename}.body")
+        write_meta(filename, key, response, **extra)
+        if on_stored is not None:
+            on_stored()
+
+    response.iter_content = iter_and_write_content  # type: ignore
+    return response
+
+
+def read_meta(filename: str) -> Dict[str, Any] | None:
+    try:
+        with open(f"{filename}.json", 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def read_response(filename: str, meta: Dict[str, Any]) -> requests.Response:
+    with open(f"{filename}.body", 'rb') as file:
+        content = file.read()
+
+    response = requests.Response()
+    response.url = meta['url']
+    response.status_code = meta['status_code']
+    response.reason = meta['reason']
+    response.encoding = meta['encoding']
+    response.headers = CaseInsensitiveDict(meta['headers'])
+    response._content = content
+    response._content_consumed = True
+    return response
+
+
+class CassetteMissingError(LookupError):
+    pass
+
+
+class RecordReplayTransport(Transport):
+
+    class Modes:
+        RECORD: str = 'record'  # always ask the server and store the answer
+        REPLAY: str = 'replay'  # only answer from the cassette directory
+        AUTO: str = 'auto'  # replay if recorded, record otherwise
+
+    _directory: str
+    _mode: str
+    _live: Transport
+
+    def __init__(
+        self,
+        directory: str = DEFAULT_CASSETTE_DIRECTORY,
+        mode: str = Modes.AUTO,
+        live: Transport | None = None
+    ):
+        assert mode in (
+            self.Modes.RECORD, self.Modes.REPLAY, self.Modes.AUTO
+        ), f"Mode '{mode}' not supported!"
+
+        self._directory = directory
+        self._mode = mode
+        self._live = live or LiveTransport()
+        os.makedirs(self._directory, exist_ok=True)
+
+    def is_recorded(self, url: str, **kwargs) -> bool:
+        filename = key_filename(self._directory, request_key(url, **kwargs))
+        return os.path.isfile(f"{filename}.json")
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        key = request_key(url, **kwargs)
+        filename = key_filename(self._directory, key)
+        meta = read_meta(filename)
+
+        if self._mode == self.Modes.REPLAY and meta is None:
+            raise CassetteMissingError(f"No cassette for {key['url']}")
+        if self._mode != self.Modes.RECORD and meta is not None:
+            return read_response(filename, meta)
+
+        # The key does not contain the validators, so they are not sent: a
+        # 304 recorded under the key would replace the recorded body. Only
+        # complete answers are recorded.
+        headers = CaseInsensitiveDict(kwargs.get('headers') or {})
+        for name in VALIDATOR_HEADERS:
+            headers.pop(name, None)
+        response = self._live.get(url, **{**kwargs, 'headers': dict(headers)})
+        if response.status_code == 200:
+            write_response(filename, key, response)
+        return response
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+
+def _transport_from_environment() -> Transport:
+    mode = os.environ.get(TRANSPORT_VARIABLE, 'live').lower()
+    if mode == 'live':
+        return LiveTransport()
+    return RecordReplayTransport(
+        os.environ.get(
+            CASSETTE_DIRECTORY_VARIABLE, DEFAULT_CASSETTE_DIRECTORY
+        ),
+        mode
+    )
+
+
+_transport: Transport | None = None
+_transport_lock: threading.Lock = threading.Lock()
+
+
+def get_transport() -> Transport:
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = _transport_from_environment()
+    return _transport
+
+
+def set_transport(transport: Transport):
+    global _transport
+    with _transport_lock:
+        _transport = transport
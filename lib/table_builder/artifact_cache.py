@@ -0,0 +1,123 @@
+import datetime as dt
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List
+
+
+class ArtifactCache:
+
+    # Finished tables (xlsx files) of earlier builds. An artifact is stored
+    # under a key that covers everything the table is built from: the files
+    # (layout, localization, specifications, the builder code), further
+    # values like the language and the time of the last update of every
+    # dataset in the table. If none of these changed, building the table
+    # again would give the same result, so the stored one is returned.
+    # Artifacts not used for `max_age` seconds are removed.
+
+    DEFAULT_DIRECTORY: str = os.path.join(".cache", "artifacts")
+    DEFAULT_MAX_AGE: float = 62 * 24 * 60 * 60.0  # s
+    EXTENSION: str = 'xlsx'
+
+    _directory: str | None
+    _max_age: float
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        directory: str | None = DEFAULT_DIRECTORY,
+        max_age: float = DEFAULT_MAX_AGE
+    ):
+        self._directory = directory
+        self._max_age = max_age
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def file_hash(filename: str) -> str:
+        with open(filename, 'rb') as file:
+            return hashlib.sha256(file.read()).hexdigest()
+
+    def key(
+        self,
+        filenames: List[str],
+        last_updates: Dict[str, dt.datetime | None],
+        **values: Any
+    ) -> str | None:
+        # `last_updates` maps the ids of the datasets to the time of their
+        # last update. Without that time it is unknown whether a dataset
+        # changed, so there is no key and the table has to be built.
+        if any(updated is None for updated in last_updates.values()):
+            return None
+        inputs = {
+            'files': {
+                os.path.normpath(filename): self.file_hash(filename)
+                for filename in filenames
+            },
+            'last_updates': {
+                dataset_id: updated.isoformat()
+                for dataset_id, updated in last_updates.items()
+                if updated is not None
+            },
+            'values': values
+        }
+        return hashlib.sha256(
+            json.dumps(inputs, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+
+    def _filename(self, key: str) -> str:
+        assert self._directory is not None
+        return os.path.join(self._directory, f"{key}.{self.EXTENSION}")
+
+    def _is_kept(self, modified_at: float) -> bool:
+        return time.time() - modified_at < self._max_age
+
+    def _evict(self):
+        assert self._directory is not None
+        with os.scandir(self._directory) as iterator:
+            for entry in iterator:
+                try:
+                    if not self._is_kept(entry.stat().st_mtime):
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def get(self, key: str | None) -> bytes | None:
+        if key is None or self._directory is None:
+            return None
+        filename = self._filename(key)
+        try:
+            if not self._is_kept(os.path.getmtime(filename)):
+                return None
+            with open(filename, 'rb') as file:
+                content = file.read()
+            # The modification time marks the last use
+            os.utime(filename)
+        except FileNotFoundError:
+            return None
+        return content
+
+    def put(self, key: str | None, content: bytes):
+        if key is None or self._directory is None:
+            return
+        # The directory is only created when something is stored, not
+        # already when the module is imported
+        os.makedirs(self._directory, exist_ok=True)
+        filename = self._filename(key)
+        temporary_filename = f"{filename}.{threading.get_ident()}.tmp"
+        with open(temporary_filename, 'wb') as file:
+            file.write(content)
+        with self._lock:
+            os.replace(temporary_filename, filename)
+            self._evict()
+
+    def clear(self):
+        if self._directory is None or not os.path.isdir(self._directory):
+            return
+        with self._lock:
+            for name in os.listdir(self._directory):
+                os.remove(os.path.join(self._directory, name))
+
+
+ARTIFACT_CACHE: ArtifactCache = ArtifactCache()
@@ -0,0 +1,8 @@
+import sys
+import unittest
+
+
+if __name__ == '__main__':
+    suite = unittest.defaultTestLoader.discover('tests', top_level_dir='.')
+    result = unittest.TextTestRunner(verbosity=2).run(suite)
+    sys.exit(0 if result.wasSuccessful() else 1)
@@ -0,0 +1,291 @@
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import tempfile
+from typing import Any, Dict, List, Tuple
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from lib.eurostat.eurostat_api.data_cache import DataCache
+from lib.eurostat.eurostat_api.metadata_cache import MetadataCache
+from lib.eurostat.eurostat_api.sdmx_data import SdmxData
+from lib.network import http_cache
+from lib.network.http_cache import CachingTransport
+from lib.network.transport import Transport
+
+# An in-process stand-in for the Eurostat API. It answers dataflow,
+# datastructure and data requests (SDMX-JSON and SDMX-CSV) for the datasets
+# added with `add_dataset`, applies the `c[...]` filters like Eurostat and
+# supports `compress=true`, `ETag`/`If-None-Match` and streamed bodies.
+
+DSD_TEMPLATE: str = (
+    '<?xml version="1.0"?>'
+    '<m:Structure'
+    ' xmlns:m="http://www.sdmx.org/resources/sdmxml/schemas/v3_0/message"'
+    ' xmlns:s="http://www.sdmx.org/resources/sdmxml/schemas/v3_0/structure">'
+    '<m:Structures><s:DataStructures><s:DataStructure>'
+    '<s:DataStructureComponents><s:DimensionList>{}</s:DimensionList>'
+    '</s:DataStructureComponents>'
+    '</s:DataStructure></s:DataStructures></m:Structures></m:Structure>'
+)
+
+UPDATED: str = "2024-05-10T23:00:00+0200"
+
+# An observation is a value or a tuple of value (or `None`) and status
+Observation = float | Tuple[float | None, str]
+
+
+def matches(period: str, operator: str, time_period: str) -> bool:
+    if operator == 'ge':
+        return period >= time_period
+    if operator == 'gt':
+        return period > time_period and not period.startswith(time_period)
+    if operator == 'le':
+        return period <= time_period or period.startswith(time_period)
+    if operator == 'lt':
+        return period < time_period
+    return period.startswith(time_period)
+
+
+def make_response(
+    status_code: int,
+    body: bytes,
+    headers: Dict[str, str],
+    url: str,
+    stream: bool
+) -> requests.Response:
+    response = requests.Response()
+    response.url = url
+    response.status_code = status_code
+    response.reason = "OK" if status_code == 200 else ""
+    response.headers = CaseInsensitiveDict(headers)
+    if stream:
+        response.raw = io.BytesIO(body)
+    else:
+        response._content = body
+        response._content_consumed = True
+    return response
+
+
+def records(data: SdmxData) -> List[Tuple[str, ...]]:
+    # The observations as sorted rows of strings, to compare data
+    df = data.string_dataframe
+    return sorted(
+        tuple(row) for row in df[data.dimension_ids + ['observation', 'status']]
+        .itertuples(index=False)
+    )
+
+
+class FakeEurostat(Transport):
+
+    dimensions: Dict[str, Dict[str, List[str]]]
+    observations: Dict[str, Dict[Tuple[str, ...], Observation]]
+    updated: Dict[str, str]
+    requests: List[Tuple[str, Dict[str, str]]]
+
+    def __init__(self):
+        self.dimensions = {}
+        self.observations = {}
+        self.updated = {}
+        self.requests = []
+
+    def add_dataset(
+        self,
+        dataset_id: str,
+        dimensions: Dict[str, List[str]],
+        observations: Dict[Tuple[str, ...], Observation],
+        updated: str = UPDATED
+    ):
+        # `dimensions` lists the values of each dimension, 'time' last. The
+        # keys of `observations` have one value per dimension.
+        assert list(dimensions)[-1] == 'time', "'time' must be last!"
+        self.dimensions[dataset_id] = dimensions
+        self.observations[dataset_id] = observations
+        self.updated[dataset_id] = updated
+
+    def _selected_values(
+        self, dataset_id: str, params: Dict[str, str]
+    ) -> Dict[str, List[str]]:
+        selected = {}
+        for dimension_id, values in self.dimensions[dataset_id].items():
+            if dimension_id == 'time':
+                conditions = [
+                    condition.split(':')
+                    for condition in params.get('c[TIME_PERIOD]', '').split('+')
+                    if condition
+                ]
+                selected[dimension_id] = [
+                    value for value in values
+                    if all(
+                        matches(value, operator, time_period)
+                        for operator, time_period in conditions
+                    )
+                ]
+            elif f'c[{dimension_id}]' in params:
+                filter_values = params[f'c[{dimension_id}]'].split(',')
+                selected[dimension_id] = [
+                    value for value in values if value in filter_values
+                ]
+            else:
+                selected[dimension_id] = list(values)
+        return selected
+
+    def sdmx_json(
+        self, dataset_id: str, params: Dict[str, str] | None = None
+    ) -> Dict[str, Any]:
+        selected = self._selected_values(dataset_id, params or {})
+        dimension_ids = list(selected)
+        values, statuses = {}, {}
+        keys = itertools.product(*selected.values())
+        for index, key in enumerate(keys):
+            observation = self.observations[dataset_id].get(key)
+            if observation is None:
+                continue
+            if isinstance(observation, tuple):
+                value, status = observation
+                statuses[str(index)] = status
+            else:
+                value = observation
+            if value is not None:
+                values[str(index)] = value
+        return {
+            'version': "2.0",
+            'class': "dataset",
+            'label': dataset_id,
+            'source': "ESTAT",
+            'updated': self.updated[dataset_id],
+            'value': values,
+            'status': statuses,
+            'id': dimension_ids,
+            'size': [len(selected[d_id]) for d_id in dimension_ids],
+            'dimension': {
+                d_id: {
+                    'label': d_id.upper(),
+                    'category': {
+                        'index': {
+                            value: i for i, value in enumerate(selected[d_id])
+                        },
+                        'label': {
+                            value: f"{value} label"
+                            for value in selected[d_id]
+                        }
+                    }
+                }
+                for d_id in dimension_ids
+            },
+            'extension': {
+                'lang': "EN",
+                'annotation': [],
+                'status': {'label': {}}
+            }
+        }
+
+    def sdmx_csv(
+        self, dataset_id: str, params: Dict[str, str] | None = None
+    ) -> str:
+        selected = self._selected_values(dataset_id, params or {})
+        header = [
+            'TIME_PERIOD' if d_id == 'time' else d_id for d_id in selected
+        ]
+        lines = [",".join(
+            ['STRUCTURE', 'STRUCTURE_ID'] + header + ['OBS_VALUE', 'OBS_FLAG']
+        )]
+        for key in itertools.product(*selected.values()):
+            observation = self.observations[dataset_id].get(key)
+            if observation is None:
+                continue
+            value, status = (
+                observation if isinstance(observation, tuple)
+                else (observation, "")
+            )
+            lines.append(",".join(
+                ['dataflow', f'ESTAT:{dataset_id}(1.0)'] + list(key)
+                + ["" if value is None else repr(float(value)), status]
+            ))
+        return "\n".join(lines) + "\n"
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        params = dict(kwargs.get('params') or {})
+        headers = CaseInsensitiveDict(kwargs.get('headers') or {})
+        self.requests.append((url, params))
+        parts = url.split('/')
+
+        if '/structure/dataflow/' in url:
+            dataset_id = parts[-2]
+            body = json.dumps({
+                'extension': {
+                    'datastructure': {'version': "3.0"},
+                    'annotation': [
+                        {'type': 'UPDATE_DATA', 'date': self.updated[dataset_id]}
+                    ]
+                }
+            }).encode('utf-8')
+        elif '/structure/datastructure/' in url:
+            dataset_id = parts[-2]
+            body = DSD_TEMPLATE.format("".join(
+                f'<s:Dimension id="{d_id}" position="{i + 1}"/>'
+                for i, d_id in enumerate(self.dimensions[dataset_id])
+                if d_id != 'time'
+            )).encode('utf-8')
+        elif '/data/dataflow/' in url:
+            dataset_id = parts[-3]
+            if params.get('format') == 'csvdata':
+                body = self.sdmx_csv(dataset_id, params).encode('utf-8')
+            else:
+                body = json.dumps(
+                    self.sdmx_json(dataset_id, params)
+                ).encode('utf-8')
+        else:
+            return make_response(404, b"", {}, url, False)
+
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if headers.get('If-None-Match') == etag:
+            return make_response(304, b"", {'ETag': etag}, url, False)
+        if params.get('compress') == 'true':
+            body = gzip.compress(body)
+        return make_response(
+            200, body, {'ETag': etag}, url, bool(kwargs.get('stream'))
+        )
+
+    def data_requests(self) -> List[Tuple[str, Dict[str, str]]]:
+        return [
+            (url, params) for url, params in self.requests
+            if '/data/dataflow/' in url
+        ]
+
+
+class FakeEurostatMixin:
+
+    # For `unittest.TestCase`s: routes all Eurostat requests of the test
+    # through `self.eurostat` and a fresh HTTP cache. `dataset_kwargs`
+    # disable the persistent metadata and data caches.
+
+    eurostat: FakeEurostat
+    http_cache_ttl: float = 0.0
+
+    def setUp(self):
+        super().setUp()
+        self.eurostat = FakeEurostat()
+        self._cache_directory = tempfile.TemporaryDirectory()
+        self._previous_cached_transport = http_cache._cached_transport
+        http_cache.set_cached_transport(CachingTransport(
+            self._cache_directory.name,
+            ttl=self.http_cache_ttl,
+            inner=self.eurostat
+        ))
+
+    def tearDown(self):
+        http_cache.set_cached_transport(self._previous_cached_transport)
+        self._cache_directory.cleanup()
+        super().tearDown()
+
+    @property
+    def dataset_kwargs(self) -> Dict[str, Any]:
+        return {
+            'metadata_cache': MetadataCache(None),
+            'data_cache': DataCache(None)
+        }
+
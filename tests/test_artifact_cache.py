@@ -0,0 +1,85 @@
+import datetime as dt
+import os
+import tempfile
+import unittest
+
+from lib.eurostat.eurostat_api.dataset import EurostatDataset
+from lib.table_builder.artifact_cache import ArtifactCache
+from tests.fake_eurostat import FakeEurostatMixin
+
+NEW_UPDATED: str = "2024-05-11T11:00:00+0200"
+
+
+class ArtifactCacheTest(FakeEurostatMixin, unittest.TestCase):
+
+    # Responses stay fresh in the HTTP cache for a long time, like in
+    # production
+    http_cache_ttl: float = 12 * 60 * 60.0
+
+    def setUp(self):
+        super().setUp()
+        self.eurostat.add_dataset("ds", {'time': ["2023"]}, {})
+        self.directory = tempfile.TemporaryDirectory()
+        self.artifact_cache = ArtifactCache(
+            os.path.join(self.directory.name, "artifacts")
+        )
+        self.source_filename = os.path.join(self.directory.name, "layout.json")
+        with open(self.source_filename, 'w') as file:
+            file.write("{}")
+
+    def tearDown(self):
+        self.directory.cleanup()
+        super().tearDown()
+
+    def key(self, **values) -> str | None:
+        # Like the table builders
+        last_updates = EurostatDataset.request_last_updates(
+            ["ds"], 'en', **self.dataset_kwargs
+        )
+        return self.artifact_cache.key(
+            [self.source_filename], last_updates, language='en', **values
+        )
+
+    def test_stored_artifact_is_returned(self):
+        self.artifact_cache.put(self.key(), b"table")
+        self.assertEqual(self.artifact_cache.get(self.key()), b"table")
+        self.assertIsNone(self.artifact_cache.get(self.key(year=2025)))
+
+    def test_directory_is_created_on_first_write(self):
+        directory = os.path.join(self.directory.name, "artifacts")
+        self.artifact_cache.clear()
+        self.assertIsNone(self.artifact_cache.get(self.key()))
+        self.assertFalse(os.path.exists(directory))
+        self.artifact_cache.put(self.key(), b"table")
+        self.assertTrue(os.path.isdir(directory))
+
+    def test_update_within_ttl_changes_key(self):
+        self.artifact_cache.put(self.key(), b"table")
+        self.eurostat.updated["ds"] = NEW_UPDATED
+        self.assertIsNone(self.artifact_cache.get(self.key()))
+
+    def test_changed_file_changes_key(self):
+        self.artifact_cache.put(self.key(), b"table")
+        with open(self.source_filename, 'w') as file:
+            file.write('{"changed": true}')
+        self.assertIsNone(self.artifact_cache.get(self.key()))
+
+    def test_no_key_without_last_update(self):
+        key = self.artifact_cache.key(
+            [self.source_filename],
+            {'ds': dt.datetime(2024, 5, 10), 'other': None}
+        )
+        self.assertIsNone(key)
+        self.artifact_cache.put(key, b"table")
+        self.assertIsNone(self.artifact_cache.get(key))
+
+    def test_unused_artifacts_are_removed(self):
+        artifact_cache = ArtifactCache(
+            os.path.join(self.directory.name, "artifacts"), max_age=0.0
+        )
+        artifact_cache.put(self.key(), b"table")
+        self.assertIsNone(artifact_cache.get(self.key()))
+
+
+if __name__ == '__main__':
+    unittest.main()
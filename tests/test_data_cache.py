@@ -0,0 +1,220 @@
+import os
+import tempfile
+import unittest
+from typing import Dict, List, Tuple
+
+from lib.eurostat.eurostat_api.data_cache import DataCache, DataQuery
+from lib.eurostat.eurostat_api.sdmx_data import SdmxData
+from tests.fake_eurostat import FakeEurostat, records
+
+GE: str = DataQuery.Operators.GREATER_OR_EQUALS
+LE: str = DataQuery.Operators.LOWER_OR_EQUALS
+EQ: str = DataQuery.Operators.EQUALS
+
+
+def query(
+    dimension_values: Dict[str, List[str]] | None = None,
+    *time_periods: Tuple[str, str]
+) -> DataQuery:
+    return DataQuery(dimension_values or {}, list(time_periods))
+
+
+class DataQueryTest(unittest.TestCase):
+
+    def test_later_lower_bound_is_contained(self):
+        self.assertTrue(query({}, (GE, "2020")).contains(query({}, (GE, "2021"))))
+        self.assertFalse(query({}, (GE, "2021")).contains(query({}, (GE, "2020"))))
+
+    def test_equals_is_contained_in_lower_bound(self):
+        self.assertTrue(query({}, (GE, "2020")).contains(query({}, (EQ, "2021"))))
+        self.assertTrue(query({}, (GE, "2020")).contains(query({}, (EQ, "2020"))))
+        self.assertFalse(query({}, (GE, "2020")).contains(query({}, (EQ, "2019"))))
+        # A single period does not contain the periods after it
+        self.assertFalse(query({}, (EQ, "2021")).contains(query({}, (GE, "2021"))))
+
+    def test_upper_bound_contains_subperiods(self):
+        self.assertTrue(query({}, (LE, "2022")).contains(query({}, (EQ, "2022-05"))))
+        self.assertTrue(query({}, (LE, "2022")).contains(query({}, (LE, "2021"))))
+        self.assertFalse(query({}, (LE, "2022-05")).contains(query({}, (LE, "2022"))))
+
+    def test_range_is_contained_in_wider_range(self):
+        self.assertTrue(
+            query({}, (GE, "2019"), (LE, "2023"))
+            .contains(query({}, (GE, "2020"), (LE, "2022")))
+        )
+        self.assertFalse(
+            query({}, (GE, "2019"), (LE, "2023"))
+            .contains(query({}, (GE, "2020")))
+        )
+
+    def test_no_time_filter(self):
+        self.assertTrue(query().contains(query({}, (GE, "2020"))))
+        self.assertFalse(query({}, (GE, "2020")).contains(query()))
+
+    def test_dimension_supersets_and_subsets(self):
+        self.assertTrue(query({'unit': ["A", "B"]}).contains(query({'unit': ["A"]})))
+        self.assertFalse(query({'unit': ["A"]}).contains(query({'unit': ["A", "B"]})))
+        # No filter stands for all values of the dimension
+        self.assertTrue(query().contains(query({'unit': ["A"]})))
+        self.assertFalse(query({'unit': ["A"]}).contains(query()))
+        self.assertTrue(
+            query({'unit': ["A"]})
+            .contains(query({'unit': ["A"], 'geo': ["BE"]}))
+        )
+
+    def test_order_and_duplicates_do_not_matter(self):
+        self.assertEqual(
+            query({'unit': ["B", "A", "A"]}, (GE, "2020"), (LE, "2022")),
+            query({'unit': ["A", "B"]}, (LE, "2022"), (GE, "2020"))
+        )
+
+
+class DataCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.eurostat = FakeEurostat()
+        self.eurostat.add_dataset(
+            "ds",
+            {
+                'unit': ["A", "B"],
+                'geo': ["BE", "DE"],
+                'time': ["2019", "2020", "2021", "2022"]
+            },
+            {
+                (unit, geo, time): (float(u + g + t), "p" if t == 3 else "")
+                for u, unit in enumerate(["A", "B"])
+                for g, geo in enumerate(["BE", "DE"])
+                for t, time in enumerate(["2019", "2020", "2021", "2022"])
+                if (u, g, t) != (1, 0, 2)
+            }
+        )
+
+    def data(self, data_query: DataQuery) -> SdmxData:
+        # The answer of Eurostat to `data_query`
+        params = {
+            f'c[{dimension_id}]': ",".join(values)
+            for dimension_id, values in data_query.dimension_values.items()
+        }
+        if data_query.time_periods:
+            params['c[TIME_PERIOD]'] = "+".join(
+                f"{operator}:{time_period}"
+                for operator, time_period in data_query.time_periods
+            )
+        return SdmxData(self.eurostat.sdmx_json("ds", params), "-")
+
+
+class DataQueryRestrictTest(DataCacheTestCase):
+
+    def test_restrict_equals_direct_request(self):
+        cached_query = query({'unit': ["A", "B"]}, (GE, "2019"))
+        for requested_query in (
+            query({'unit': ["A"]}, (GE, "2020")),
+            query({'unit': ["B"], 'geo': ["BE"]}, (EQ, "2021")),
+            query({'unit': ["A", "B"]}, (GE, "2020"), (LE, "2021"))
+        ):
+            with self.subTest(query=requested_query.json_data):
+                self.assertTrue(cached_query.contains(requested_query))
+                self.assertEqual(
+                    records(requested_query.restrict(self.data(cached_query))),
+                    records(self.data(requested_query))
+                )
+
+
+class DataCacheTest(DataCacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+        super().tearDown()
+
+    def cache(self, **kwargs) -> DataCache:
+        return DataCache(self.directory.name, **kwargs)
+
+    def put(self, cache: DataCache, data_query: DataQuery):
+        cache.put("ds", 'en', 'json', "-", data_query, self.data(data_query))
+
+    def get(
+        self, cache: DataCache, data_query: DataQuery, **kwargs
+    ) -> SdmxData | None:
+        return cache.get("ds", 'en', 'json', "-", data_query, **kwargs)
+
+    def stored_queries(self) -> int:
+        return len([
+            name for name in os.listdir(self.directory.name)
+            if name.endswith('.json')
+        ])
+
+    def test_directory_is_created_on_first_write(self):
+        directory = os.path.join(self.directory.name, "data")
+        cache = DataCache(directory)
+        cache.clear()
+        self.assertIsNone(self.get(cache, query()))
+        self.assertFalse(os.path.exists(directory))
+        self.put(cache, query())
+        self.assertIsNotNone(self.get(DataCache(directory), query()))
+
+    def test_contained_query_is_answered_from_cache(self):
+        cache = self.cache()
+        self.put(cache, query({'unit': ["A", "B"]}, (GE, "2020")))
+        requested_query = query({'unit': ["B"]}, (EQ, "2021"))
+        self.assertEqual(
+            records(self.get(cache, requested_query)),
+            records(self.data(requested_query))
+        )
+        self.assertIsNone(self.get(cache, query({'unit': ["B"]}, (GE, "2019"))))
+        self.assertIsNone(self.get(cache, query({}, (GE, "2020"))))
+
+    def test_put_evicts_contained_entries(self):
+        cache = self.cache()
+        self.put(cache, query({'unit': ["A"]}, (GE, "2021")))
+        self.put(cache, query({'unit': ["B"]}, (GE, "2021")))
+        self.assertEqual(self.stored_queries(), 2)
+        self.put(cache, query({'unit': ["A"]}, (GE, "2019")))
+        # Only the entry for unit A is contained in the new one
+        self.assertEqual(self.stored_queries(), 2)
+        self.put(cache, query({}, (GE, "2019")))
+        self.assertEqual(self.stored_queries(), 1)
+
+        # Also a new instance only finds the containing entry
+        requested_query = query({'unit': ["A"]}, (GE, "2021"))
+        self.assertEqual(
+            records(self.get(self.cache(), requested_query)),
+            records(self.data(requested_query))
+        )
+
+    def test_outdated_entries_are_only_returned_on_request(self):
+        cache = self.cache(ttl=0.0)
+        self.put(cache, query({'unit': ["A"]}))
+        self.assertIsNone(self.get(cache, query({'unit': ["A"]})))
+        self.assertIsNotNone(
+            self.get(cache, query({'unit': ["A"]}), include_outdated=True)
+        )
+
+
+    def test_least_recently_used_entries_are_dropped_from_memory(self):
+        data_query = query({'unit': ["A"]})
+        data = self.data(data_query)
+        for directory in (None, self.directory.name):
+            with self.subTest(directory=directory):
+                cache = DataCache(directory, max_entries=2)
+                for language in ('en', 'de', 'fr'):
+                    cache.put("ds", language, 'json', "-", data_query, data)
+                    # 'en' is used again, so 'de' is dropped first
+                    cache.get("ds", 'en', 'json', "-", data_query)
+                found = {
+                    language: cache.get(
+                        "ds", language, 'json', "-", data_query
+                    ) is not None
+                    for language in ('fr', 'en', 'de')
+                }
+                # Without a directory the dropped entries are lost
+                self.assertEqual(
+                    found, {'fr': True, 'en': True, 'de': directory is not None}
+                )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,247 @@
+import datetime as dt
+import gzip
+import json
+import tempfile
+import time
+import unittest
+import zlib
+from typing import Dict, Iterator, List
+
+from lib.eurostat.eurostat_api.data_cache import DataCache
+from lib.eurostat.eurostat_api.dataset import EurostatDataset
+from lib.eurostat.eurostat_api.fetch_planner import FetchPlanner
+from lib.eurostat.eurostat_api.filters import TimePeriodFilter
+from lib.eurostat.eurostat_api.metadata_cache import MetadataCache
+from lib.eurostat.eurostat_api.sdmx_data import SdmxData
+from tests.fake_eurostat import UPDATED, FakeEurostatMixin, records
+
+NEW_UPDATED: str = "2024-05-11T11:00:00+0200"
+
+
+class LastUpdateTest(FakeEurostatMixin, unittest.TestCase):
+
+    # Responses stay fresh in the HTTP cache for a long time, like in
+    # production
+    http_cache_ttl: float = 12 * 60 * 60.0
+
+    def setUp(self):
+        super().setUp()
+        self.eurostat.add_dataset(
+            "ds", {'geo': ["BE", "DE"], 'time': ["2022", "2023"]}, {}
+        )
+
+    def dataset(self) -> EurostatDataset:
+        return EurostatDataset("ds", 'en', **self.dataset_kwargs)
+
+    def test_update_within_ttl_is_seen(self):
+        self.assertEqual(
+            self.dataset().request_last_update(),
+            dt.datetime.fromisoformat(UPDATED)
+        )
+        self.eurostat.updated["ds"] = NEW_UPDATED
+        self.assertEqual(
+            self.dataset().request_last_update(),
+            dt.datetime.fromisoformat(NEW_UPDATED)
+        )
+
+    def test_is_unchanged_since(self):
+        updated = dt.datetime.fromisoformat(UPDATED)
+        self.assertTrue(self.dataset().is_unchanged_since(updated))
+        self.eurostat.updated["ds"] = NEW_UPDATED
+        self.assertFalse(self.dataset().is_unchanged_since(updated))
+
+    def test_request_last_updates(self):
+        self.eurostat.add_dataset("other", {'time': ["2023"]}, {})
+        self.eurostat.updated["other"] = NEW_UPDATED
+        self.assertEqual(
+            EurostatDataset.request_last_updates(
+                ["other", "ds", "other"], 'en', max_workers=2,
+                **self.dataset_kwargs
+            ),
+            {
+                'ds': dt.datetime.fromisoformat(UPDATED),
+                'other': dt.datetime.fromisoformat(NEW_UPDATED)
+            }
+        )
+
+
+class DecompressTest(unittest.TestCase):
+
+    BODY: bytes = json.dumps({'value': {str(i): i for i in range(1000)}}).encode()
+
+    @staticmethod
+    def chunks(body: bytes, first_size: int, size: int) -> Iterator[bytes]:
+        # Like `iter_content`, possibly with a shorter first chunk
+        positions = [0] + list(range(first_size, len(body), size))
+        for start, end in zip(positions, positions[1:] + [len(body)]):
+            yield body[start:end]
+
+    def decompress(self, body: bytes, first_size: int = 100) -> bytes:
+        return b"".join(
+            EurostatDataset._decompress(self.chunks(body, first_size, 100))
+        )
+
+    def test_gzip(self):
+        self.assertEqual(self.decompress(gzip.compress(self.BODY)), self.BODY)
+
+    def test_zlib(self):
+        for level in (1, 6, 9):
+            with self.subTest(level=level):
+                self.assertEqual(
+                    self.decompress(zlib.compress(self.BODY, level)), self.BODY
+                )
+
+    def test_header_split_across_chunks(self):
+        self.assertEqual(self.decompress(gzip.compress(self.BODY), 1), self.BODY)
+        self.assertEqual(self.decompress(zlib.compress(self.BODY), 1), self.BODY)
+
+    def test_uncompressed(self):
+        for body in (self.BODY, b"STRUCTURE,STRUCTURE_ID\n", b"x", b""):
+            with self.subTest(body=body[:10]):
+                self.assertEqual(self.decompress(body), body)
+                self.assertEqual(self.decompress(body, 1), body)
+
+
+class IncrementalUpdateTest(FakeEurostatMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.eurostat.add_dataset(
+            "ds",
+            {'geo': ["BE", "DE"], 'time': ["2020", "2021", "2022", "2023"]},
+            {
+                (geo, time): float(g * 10 + t)
+                for g, geo in enumerate(["BE", "DE"])
+                for t, time in enumerate(["2020", "2021", "2022"])
+            }
+        )
+        self.directory = tempfile.TemporaryDirectory()
+        # Every entry is outdated at once, but kept as a base for updates
+        self.data_cache = DataCache(self.directory.name, ttl=0.0)
+
+    def tearDown(self):
+        self.directory.cleanup()
+        super().tearDown()
+
+    def dataset(self, data_cache: DataCache | None = None) -> EurostatDataset:
+        dataset = EurostatDataset(
+            "ds", 'en',
+            metadata_cache=MetadataCache(None),
+            data_cache=data_cache or self.data_cache
+        )
+        TimePeriodFilter(dataset).add(
+            TimePeriodFilter.Operators.GREATER_OR_EQUALS, "2020"
+        )
+        return dataset
+
+    def request_data(self) -> SdmxData:
+        dataset = self.dataset()
+        dataset.request_data()
+        return dataset.data
+
+    def downloaded_data(self) -> SdmxData:
+        dataset = self.dataset(DataCache(None))
+        dataset.request_data()
+        return dataset.data
+
+    def time_periods(self) -> List[str]:
+        # The time filters of the data requests since the last call
+        requests = self.eurostat.data_requests()
+        self.eurostat.requests.clear()
+        return [params['c[TIME_PERIOD]'] for _, params in requests]
+
+    def publish(self, observations: Dict[str, float]):
+        # New observations of BE by period and a new time of the last update
+        for time_value, value in observations.items():
+            self.eurostat.observations["ds"][("BE", time_value)] = value
+        self.eurostat.updated["ds"] = NEW_UPDATED
+
+    def test_unchanged_dataflow_skips_download(self):
+        self.request_data()
+        self.assertEqual(self.time_periods(), ["ge:2020"])
+        self.request_data()
+        self.assertEqual(self.time_periods(), [])
+
+    def test_new_periods_are_merged(self):
+        self.request_data()
+        self.time_periods()
+        self.publish({"2023": 99.0})
+        data = self.request_data()
+        self.assertEqual(self.time_periods(), ["ge:2022"])
+        self.assertEqual(records(data), records(self.downloaded_data()))
+        self.assertEqual(data.updated, dt.datetime.fromisoformat(NEW_UPDATED))
+
+    def test_revised_latest_period_is_loaded_completely(self):
+        self.request_data()
+        self.time_periods()
+        self.publish({"2022": -1.0, "2023": 99.0})
+        data = self.request_data()
+        self.assertEqual(self.time_periods(), ["ge:2022", "ge:2020"])
+        self.assertEqual(records(data), records(self.downloaded_data()))
+
+    def test_old_full_download_is_reloaded_completely(self):
+        # Revisions of earlier periods are only seen by a full download
+        data = self.request_data()
+        self.time_periods()
+        self.data_cache.put(
+            "ds", 'en', 'json', "-", self.dataset()._query(), data,
+            time.time() - self.data_cache.max_age
+        )
+        self.publish({"2020": -1.0, "2023": 99.0})
+        data = self.request_data()
+        self.assertEqual(self.time_periods(), ["ge:2020"])
+        self.assertEqual(records(data), records(self.downloaded_data()))
+
+    def test_merged_data_keeps_time_of_full_download(self):
+        self.request_data()
+        self.time_periods()
+        downloaded_at = self.data_cache.get_entry(
+            "ds", 'en', 'json', "-", self.dataset()._query(),
+            include_outdated=True
+        ).downloaded_at
+        self.publish({"2023": 99.0})
+        self.request_data()
+        entry = DataCache(self.directory.name, ttl=0.0).get_entry(
+            "ds", 'en', 'json', "-", self.dataset()._query(),
+            include_outdated=True
+        )
+        self.assertEqual(entry.downloaded_at, downloaded_at)
+        self.assertGreater(entry.stored_at, downloaded_at)
+
+    def test_dataflow_updated_inside_ttl_is_loaded(self):
+        # The planner passes the probed time of the last update on, so
+        # cached data is updated although it is still within the `ttl`
+        data_cache = DataCache(self.directory.name)
+        self.dataset(data_cache).request_data()
+        self.time_periods()
+        self.publish({"2023": 99.0})
+        last_updates = EurostatDataset.request_last_updates(
+            ["ds"], 'en', metadata_cache=MetadataCache(None)
+        )
+        planner = FetchPlanner(
+            'en', last_updates=last_updates,
+            metadata_cache=MetadataCache(None), data_cache=data_cache
+        )
+        planner.add(
+            "ds", "ds", {},
+            [(TimePeriodFilter.Operators.GREATER_OR_EQUALS, "2020")]
+        )
+        dataset = planner.fetch()["ds"]
+        self.assertEqual(self.time_periods(), ["ge:2022"])
+        self.assertTrue(dataset.includes_update(last_updates["ds"]))
+        self.assertEqual(records(dataset.data), records(self.downloaded_data()))
+
+    def test_refresh(self):
+        dataset = self.dataset()
+        dataset.request_data()
+        self.time_periods()
+        dataset.refresh()
+        self.assertEqual(self.time_periods(), [])
+        self.publish({"2023": 99.0})
+        dataset.refresh()
+        self.assertEqual(self.time_periods(), ["ge:2022"])
+        self.assertEqual(records(dataset.data), records(self.downloaded_data()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+from typing import List, Tuple
+
+from lib.eurostat.eurostat_api.dataset import EurostatDataset
+from lib.eurostat.eurostat_api.fetch_planner import FetchPlanner
+from lib.eurostat.eurostat_api.filters import DimensionFilter, TimePeriodFilter
+from lib.eurostat.eurostat_api.retry import Deadline, DeadlineExceeded
+from lib.eurostat.eurostat_api.sdmx_data import SdmxData
+from tests.fake_eurostat import FakeEurostatMixin, records
+
+UNITS: List[str] = ["A", "B", "C"]
+GEOS: List[str] = ["BE", "DE", "FR"]
+TIMES: List[str] = ["2019", "2020", "2021", "2022", "2023"]
+GE_2020: Tuple[str, str] = (TimePeriodFilter.Operators.GREATER_OR_EQUALS, "2020")
+
+
+class FetchPlannerTest(FakeEurostatMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.eurostat.add_dataset(
+            "ds",
+            {'unit': UNITS, 'geo': GEOS, 'time': TIMES},
+            {
+                (unit, geo, time): (
+                    float(100 * u + 10 * g + t) if (u + g + t) % 4 else None,
+                    "p" if (u + t) % 3 == 0 else ""
+                )
+                for u, unit in enumerate(UNITS)
+                for g, geo in enumerate(GEOS)
+                for t, time in enumerate(TIMES)
+            }
+        )
+
+    def planner(self, **kwargs) -> FetchPlanner:
+        return FetchPlanner('en', **kwargs, **self.dataset_kwargs)
+
+    def separate(
+        self, dimension_values, time_periods, dataset_id: str = "ds"
+    ) -> SdmxData:
+        dataset = EurostatDataset(dataset_id, 'en', **self.dataset_kwargs)
+        dimension_filter = DimensionFilter(dataset)
+        for dimension_id, values in dimension_values.items():
+            dimension_filter.add(
+                dimension_id, [values] if isinstance(values, str) else values
+            )
+        time_period_filter = TimePeriodFilter(dataset)
+        for operator, time_period in time_periods:
+            time_period_filter.add(operator, time_period)
+        dataset.request_data()
+        return dataset.data
+
+    def test_split_back_equals_separate_fetches(self):
+        planner = self.planner()
+        slices = {
+            'a': {'unit': "A"},
+            'b': {'unit': "B"},
+            'c': {'unit': "C"}
+        }
+        for key, dimension_values in slices.items():
+            planner.add(key, "ds", dimension_values, [GE_2020])
+        self.assertEqual(planner.request_count, 1)
+
+        datasets = planner.fetch(max_workers=2)
+        self.assertEqual(len(self.eurostat.data_requests()), 1)
+        for key, dimension_values in slices.items():
+            expected = self.separate(dimension_values, [GE_2020])
+            self.assertEqual(records(datasets[key].data), records(expected))
+            self.assertEqual(
+                datasets[key].data.get_latest_time_value_with(0.5, {}),
+                expected.get_latest_time_value_with(0.5, {})
+            )
+
+    def test_overfetching_group_is_split(self):
+        # The union would be 3 x 3 series for 3 needed ones
+        planner = self.planner()
+        for key, unit, geo in (('a', "A", "BE"), ('b', "B", "DE"), ('c', "C", "FR")):
+            planner.add(key, "ds", {'unit': unit, 'geo': geo}, [GE_2020])
+        self.assertEqual(planner.request_count, 3)
+
+        datasets = planner.fetch()
+        expected = self.separate({'unit': "B", 'geo': "DE"}, [GE_2020])
+        self.assertEqual(records(datasets['b'].data), records(expected))
+
+    def test_slices_with_other_filters_are_not_coalesced(self):
+        planner = self.planner()
+        planner.add('a', "ds", {'unit': "A"}, [GE_2020])
+        planner.add('b', "ds", {'unit': "B"}, [])
+        planner.add('c', "ds", {'unit': "C", 'geo': "BE"}, [GE_2020])
+        self.assertEqual(planner.request_count, 3)
+
+        datasets = planner.fetch()
+        self.assertEqual(
+            records(datasets['b'].data), records(self.separate({'unit': "B"}, []))
+        )
+
+    def test_same_slice_twice_is_rejected(self):
+        planner = self.planner()
+        planner.add('a', "ds", {'unit': "A"})
+        with self.assertRaises(AssertionError):
+            planner.add('a', "ds", {'unit': "B"})
+
+    def test_deadline_exceeded_carries_finished_datasets(self):
+        planner = self.planner(deadline=Deadline(0.0))
+        planner.add('a', "ds", {'unit': "A"}, [GE_2020])
+        with self.assertRaises(DeadlineExceeded) as context:
+            planner.fetch()
+        self.assertEqual(context.exception.partial_results, {})
+        self.assertEqual(self.eurostat.data_requests(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,260 @@
+import io
+import os
+import tempfile
+import time
+import unittest
+from typing import Any, Dict, List
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from lib.network.http_cache import CachingTransport
+from lib.network.transport import RecordReplayTransport, Transport
+
+
+def make_response(
+    status_code: int,
+    body: bytes = b"",
+    headers: Dict[str, str] | None = None,
+    stream: bool = False
+) -> requests.Response:
+    response = requests.Response()
+    response.url = "https://example.org/data"
+    response.status_code = status_code
+    response.reason = "OK" if status_code == 200 else ""
+    response.headers = CaseInsensitiveDict(headers or {})
+    if stream:
+        response.raw = io.BytesIO(body)
+    else:
+        response._content = body
+        response._content_consumed = True
+    return response
+
+
+class StubTransport(Transport):
+
+    # Answers with the current `body` and `etag` like a server that supports
+    # `If-None-Match`
+
+    body: bytes
+    etag: str
+    requests: List[Dict[str, Any]]
+
+    def __init__(self, body: bytes = b"first", etag: str = '"1"'):
+        self.body = body
+        self.etag = etag
+        self.requests = []
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        headers = CaseInsensitiveDict(kwargs.get('headers') or {})
+        self.requests.append({'url': url, 'headers': headers, 'kwargs': kwargs})
+        if headers.get('If-None-Match') == self.etag:
+            return make_response(304, headers={'ETag': self.etag})
+        return make_response(
+            200, self.body, {'ETag': self.etag}, bool(kwargs.get('stream'))
+        )
+
+
+class CachingTransportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.inner = StubTransport()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def stored_names(self) -> List[str]:
+        return sorted(os.listdir(self.directory.name))
+
+    def transport(self, **kwargs) -> CachingTransport:
+        return CachingTransport(
+            self.directory.name, inner=self.inner, **kwargs
+        )
+
+    def test_fresh_response_is_served_without_request(self):
+        transport = self.transport(ttl=60.0)
+        self.assertEqual(transport.get("https://example.org/data").content, b"first")
+        self.inner.body = b"second"
+        self.assertEqual(transport.get("https://example.org/data").content, b"first")
+        self.assertEqual(len(self.inner.requests), 1)
+
+    def test_max_age_forces_revalidation(self):
+        transport = self.transport(ttl=60.0)
+        transport.get("https://example.org/data")
+        self.inner.body, self.inner.etag = b"second", '"2"'
+        response = transport.get("https://example.org/data", max_age=0.0)
+        self.assertEqual(response.content, b"second")
+        self.assertEqual(len(self.inner.requests), 2)
+        self.assertNotIn('max_age', self.inner.requests[1]['kwargs'])
+        # Later requests without `max_age` get the renewed entry
+        self.assertEqual(transport.get("https://example.org/data").content, b"second")
+        self.assertEqual(len(self.inner.requests), 2)
+
+    def test_stale_response_is_revalidated(self):
+        transport = self.transport(ttl=0.0)
+        transport.get("https://example.org/data")
+        response = transport.get("https://example.org/data")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"first")
+        self.assertEqual(len(self.inner.requests), 2)
+        self.assertEqual(
+            self.inner.requests[1]['headers']['If-None-Match'], '"1"'
+        )
+
+    def test_changed_response_replaces_entry(self):
+        transport = self.transport(ttl=0.0)
+        transport.get("https://example.org/data")
+        self.inner.body, self.inner.etag = b"second", '"2"'
+        self.assertEqual(transport.get("https://example.org/data").content, b"second")
+        self.inner.body = b"third"
+        # Unchanged etag: the second body is served from the cache
+        self.assertEqual(transport.get("https://example.org/data").content, b"second")
+
+    def test_key_contains_params_and_language(self):
+        transport = self.transport(ttl=60.0)
+        transport.get("https://example.org/data", params={'a': '1'})
+        transport.get("https://example.org/data", params={'a': '2'})
+        transport.get(
+            "https://example.org/data",
+            params={'a': '1'},
+            headers={'Accept-Language': 'de'}
+        )
+        transport.get("https://example.org/data", params={'a': '1'})
+        self.assertEqual(len(self.inner.requests), 3)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        self.inner.body = b"x" * 10
+        transport = self.transport(ttl=60.0, max_size=25)
+        for i in range(3):
+            transport.get(f"https://example.org/{i}")
+            # The modification time marks the last use
+            time.sleep(0.01)
+        bodies = [
+            name for name in os.listdir(self.directory.name)
+            if name.endswith('.body')
+        ]
+        self.assertEqual(len(bodies), 2)
+        transport.get("https://example.org/0")
+        self.assertEqual(len(self.inner.requests), 4)
+
+    def test_error_responses_are_not_stored(self):
+        class FailingTransport(Transport):
+            def get(self, url: str, **kwargs) -> requests.Response:
+                return make_response(503)
+
+        transport = CachingTransport(
+            self.directory.name, inner=FailingTransport()
+        )
+        self.assertEqual(transport.get("https://example.org/data").status_code, 503)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_streamed_response_is_stored_while_read(self):
+        self.inner.body = b"x" * 100
+        transport = self.transport(ttl=60.0)
+        response = transport.get("https://example.org/data", stream=True)
+        self.assertEqual(self.stored_names(), [])
+        chunks = list(response.iter_content(30))
+        self.assertEqual(b"".join(chunks), self.inner.body)
+        self.assertEqual(len(self.stored_names()), 2)
+
+        response = transport.get("https://example.org/data", stream=True)
+        self.assertEqual(b"".join(response.iter_content(30)), self.inner.body)
+        self.assertEqual(len(self.inner.requests), 1)
+
+    def test_partly_read_streamed_response_is_not_stored(self):
+        self.inner.body = b"x" * 100
+        transport = self.transport(ttl=60.0)
+        response = transport.get("https://example.org/data", stream=True)
+        chunks = response.iter_content(30)
+        next(chunks)
+        chunks.close()
+        self.assertEqual(self.stored_names(), [])
+
+        transport.get("https://example.org/data", stream=True)
+        self.assertEqual(len(self.inner.requests), 2)
+
+    def test_revalidated_streamed_response_keeps_body(self):
+        transport = self.transport(ttl=0.0)
+        response = transport.get("https://example.org/data", stream=True)
+        self.assertEqual(response.content, b"first")
+        response = transport.get("https://example.org/data", stream=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"first")
+        self.assertEqual(len(self.inner.requests), 2)
+
+
+    def remove_bodies(self):
+        for name in self.stored_names():
+            if name.endswith('.body'):
+                os.remove(os.path.join(self.directory.name, name))
+
+    def test_missing_body_is_a_miss(self):
+        transport = self.transport(ttl=60.0)
+        transport.get("https://example.org/data")
+        # Evicted by another thread after the metadata was read
+        self.remove_bodies()
+        self.assertEqual(transport.get("https://example.org/data").content, b"first")
+        self.assertEqual(len(self.inner.requests), 2)
+
+    def test_missing_body_after_not_modified_is_requested_again(self):
+        transport = self.transport(ttl=0.0)
+        transport.get("https://example.org/data")
+        self.remove_bodies()
+        response = transport.get("https://example.org/data")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"first")
+        self.assertEqual(
+            [
+                request['headers'].get('If-None-Match')
+                for request in self.inner.requests
+            ],
+            [None, '"1"', None]
+        )
+
+
+class RecordThroughCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cassette_directory = os.path.join(self.directory.name, "cassettes")
+        self.live = StubTransport()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def cache(self, name: str, mode: str) -> CachingTransport:
+        return CachingTransport(
+            os.path.join(self.directory.name, name),
+            ttl=0.0,
+            inner=RecordReplayTransport(
+                self.cassette_directory, mode, live=self.live
+            )
+        )
+
+    def test_revalidation_does_not_replace_recording(self):
+        cache = self.cache("warm", RecordReplayTransport.Modes.RECORD)
+        cache.get("https://example.org/data")
+        # Revalidated by the cache, but recorded without the validators
+        self.assertEqual(cache.get("https://example.org/data").content, b"first")
+        self.assertNotIn('If-None-Match', self.live.requests[1]['headers'])
+
+        cache = self.cache("cold", RecordReplayTransport.Modes.REPLAY)
+        response = cache.get("https://example.org/data")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"first")
+
+    def test_error_responses_are_not_recorded(self):
+        class FailingTransport(Transport):
+            def get(self, url: str, **kwargs) -> requests.Response:
+                return make_response(503)
+
+        transport = RecordReplayTransport(
+            self.cassette_directory, live=FailingTransport()
+        )
+        self.assertEqual(transport.get("https://example.org/data").status_code, 503)
+        self.assertFalse(transport.is_recorded("https://example.org/data"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import os
+import tempfile
+import unittest
+
+from lib.eurostat.eurostat_api.metadata_cache import MetadataCache
+
+
+class MetadataCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.temporary_directory.name, "metadata")
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def test_directory_is_created_on_first_write(self):
+        metadata_cache = MetadataCache(self.directory)
+        metadata_cache.clear()
+        self.assertFalse(os.path.exists(self.directory))
+
+        self.assertEqual(metadata_cache.version("ds", 'en', lambda: "1.0"), "1.0")
+        self.assertTrue(os.path.isdir(self.directory))
+        # Read from the directory instead of loaded again
+        self.assertEqual(
+            MetadataCache(self.directory).version("ds", 'en', lambda: "2.0"),
+            "1.0"
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import email.utils
+import time
+import unittest
+from typing import List
+from unittest import mock
+
+import requests
+
+from lib.eurostat.eurostat_api.retry import Deadline, DeadlineExceeded, RetryPolicy
+from tests.fake_eurostat import make_response
+
+URL: str = "https://example.org/data"
+
+
+class ScriptedGet:
+
+    # Answers with the given responses (or raises the given exceptions) in
+    # order and records the keyword arguments of the calls
+
+    def __init__(self, answers: List[requests.Response | Exception]):
+        self.answers = list(answers)
+        self.calls = []
+
+    def __call__(self, **kwargs) -> requests.Response:
+        self.calls.append(kwargs)
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+def response(status_code: int, **headers: str) -> requests.Response:
+    return make_response(status_code, b"body", headers, URL, True)
+
+
+class RetryPolicyTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('lib.eurostat.eurostat_api.retry.time.sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sleeps(self) -> List[float]:
+        return [call.args[0] for call in self.sleep.call_args_list]
+
+    def test_retry_after_seconds(self):
+        get = ScriptedGet([
+            response(429, **{'Retry-After': "3"}), response(200)
+        ])
+        result = RetryPolicy(jitter=0.0).get(get, URL)
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(self.sleeps(), [3.0])
+
+    def test_retry_after_date(self):
+        retry_at = email.utils.formatdate(time.time() + 30.0, usegmt=True)
+        get = ScriptedGet([
+            response(503, **{'Retry-After': retry_at}), response(200)
+        ])
+        RetryPolicy().get(get, URL)
+        self.assertEqual(len(self.sleeps()), 1)
+        self.assertAlmostEqual(self.sleeps()[0], 30.0, delta=2.0)
+
+    def test_retry_after_is_capped_by_max_delay(self):
+        get = ScriptedGet([
+            response(429, **{'Retry-After': "3600"}), response(200)
+        ])
+        RetryPolicy(max_delay=10.0).get(get, URL)
+        self.assertEqual(self.sleeps(), [10.0])
+
+    def test_retried_response_is_closed_before_waiting(self):
+        retried = response(503)
+        RetryPolicy().get(ScriptedGet([retried, response(200)]), URL)
+        self.assertTrue(retried.raw.closed)
+
+    def test_deadline_caps_request_timeout(self):
+        get = ScriptedGet([response(200)])
+        RetryPolicy(timeout=60.0).get(get, URL, deadline=Deadline(5.0))
+        self.assertLessEqual(get.calls[0]['timeout'], 5.0)
+
+    def test_wait_beyond_deadline_raises(self):
+        get = ScriptedGet([
+            response(429, **{'Retry-After': "30"}), response(200)
+        ])
+        with self.assertRaises(DeadlineExceeded):
+            RetryPolicy().get(get, URL, deadline=Deadline(5.0))
+        self.assertEqual(self.sleeps(), [])
+        self.assertEqual(len(get.calls), 1)
+
+    def test_expired_deadline_raises_before_request(self):
+        get = ScriptedGet([response(200)])
+        with self.assertRaises(DeadlineExceeded):
+            RetryPolicy().get(get, URL, deadline=Deadline(0.0))
+        self.assertEqual(get.calls, [])
+
+    def test_gives_up_after_max_attempts_with_last_response(self):
+        get = ScriptedGet([response(503) for _ in range(3)])
+        result = RetryPolicy(max_attempts=3).get(get, URL)
+        self.assertEqual(result.status_code, 503)
+        self.assertEqual(len(get.calls), 3)
+        self.assertEqual(len(self.sleeps()), 2)
+
+    def test_gives_up_after_max_attempts_with_last_exception(self):
+        get = ScriptedGet([requests.ConnectionError() for _ in range(3)])
+        with self.assertRaises(requests.ConnectionError):
+            RetryPolicy(max_attempts=3).get(get, URL)
+        self.assertEqual(len(get.calls), 3)
+        self.assertEqual(len(self.sleeps()), 2)
+
+    def test_failed_read_is_retried(self):
+        def read(response: requests.Response) -> bytes:
+            if len(get.calls) == 1:
+                raise requests.exceptions.ChunkedEncodingError()
+            return response.content
+
+        first = response(200)
+        get = ScriptedGet([first, response(200)])
+        self.assertEqual(RetryPolicy().get(get, URL, read=read), b"body")
+        self.assertTrue(first.raw.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
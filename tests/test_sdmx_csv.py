@@ -0,0 +1,89 @@
+import datetime as dt
+import unittest
+
+from lib.eurostat.eurostat_api.dataset import EurostatDataset
+from lib.eurostat.eurostat_api.sdmx_csv import read_sdmx_csv
+from lib.eurostat.eurostat_api.sdmx_data import SdmxData
+from tests.fake_eurostat import FakeEurostatMixin, records
+
+UPDATED: dt.datetime = dt.datetime(2024, 5, 10, 21, 0, tzinfo=dt.timezone.utc)
+
+
+class SdmxCsvTest(FakeEurostatMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.eurostat.add_dataset(
+            "ds",
+            {
+                'unit': ["A", "B"],
+                'geo': ["BE", "DE", "FR"],
+                'time': ["2021", "2022", "2023"]
+            },
+            {
+                ("A", "BE", "2021"): 1.5,
+                ("A", "BE", "2022"): (-2e-3, "p"),
+                ("A", "DE", "2021"): (None, "c"),
+                ("A", "FR", "2023"): 1234567.0,
+                ("B", "DE", "2022"): (0.0, "e"),
+                ("B", "FR", "2023"): (42.0, "bp"),
+                ("B", "FR", "2021"): 7.0
+            }
+        )
+
+    def request(self, data_format: str) -> SdmxData:
+        dataset = EurostatDataset(
+            "ds", 'en', data_format=data_format, **self.dataset_kwargs
+        )
+        dataset.request_data()
+        return dataset.data
+
+    def test_same_data_as_sdmx_json(self):
+        json_data = self.request(EurostatDataset.Formats.JSON)
+        csv_data = self.request(EurostatDataset.Formats.CSV)
+        self.assertEqual(records(csv_data), records(json_data))
+        self.assertEqual(csv_data.dimension_ids, json_data.dimension_ids)
+        self.assertEqual(list(csv_data.periods), list(json_data.periods))
+        for fill_level in (0.1, 0.5, 1.0):
+            self.assertEqual(
+                csv_data.get_latest_time_value_with(fill_level, {}),
+                json_data.get_latest_time_value_with(fill_level, {})
+            )
+        self.assertEqual(
+            csv_data.get_observation({'unit': "A", 'geo': "BE", 'time': "2022"}),
+            json_data.get_observation({'unit': "A", 'geo': "BE", 'time': "2022"})
+        )
+
+    def content(self) -> bytes:
+        return self.eurostat.sdmx_csv("ds").encode('utf-8')
+
+    def test_columns_follow_the_header(self):
+        data = read_sdmx_csv(self.content(), ['geo', 'unit'], 'en', UPDATED, "-")
+        self.assertEqual(data.dimension_ids, ['unit', 'geo', 'time'])
+        self.assertEqual(data.updated, UPDATED)
+        self.assertEqual(data.observation_count, 7)
+        self.assertEqual(data.oldest_period, "2021")
+        self.assertEqual(data.latest_period, "2023")
+
+    def test_flags(self):
+        content = self.content().replace(b",bp\n", b",pp\n")
+        data = read_sdmx_csv(content, ['unit', 'geo'], 'en', UPDATED, "-")
+        df = data.string_dataframe.set_index(['unit', 'geo', 'time'])
+        # Repeated flags are merged, missing flags and values are `none_value`
+        self.assertEqual(df.loc[("B", "FR", "2023"), 'status'], "p")
+        self.assertEqual(df.loc[("A", "BE", "2021"), 'status'], "-")
+        self.assertEqual(df.loc[("A", "DE", "2021"), 'observation'], "-")
+        self.assertEqual(df.loc[("A", "DE", "2021"), 'status'], "c")
+
+    def test_without_flag_column(self):
+        lines = self.content().decode('utf-8').splitlines()
+        content = "\n".join(
+            line.rsplit(",", 1)[0] for line in lines
+        ).encode('utf-8')
+        data = read_sdmx_csv(content, ['unit', 'geo'], 'en', UPDATED, "-")
+        self.assertEqual(set(data.string_dataframe['status']), {"-"})
+        self.assertEqual(data.observation_count, 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
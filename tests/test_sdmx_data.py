@@ -0,0 +1,210 @@
+import itertools
+import os
+import tempfile
+import unittest
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pyarrow as pa
+
+from lib.eurostat.eurostat_api.sdmx_data import SdmxData
+from tests.fake_eurostat import FakeEurostat, Observation, records
+
+UNITS: List[str] = ["A", "B"]
+GEOS: List[str] = ["BE", "DE", "FR"]
+TIMES: List[str] = ["2020", "2021", "2022", "2023"]
+
+
+class SdmxDataTestCase(unittest.TestCase):
+
+    def data(
+        self,
+        observations: Dict[Tuple[str, ...], Observation],
+        time_filter: str | None = None,
+        geos: List[str] = GEOS,
+        updated: str = "2024-05-10T23:00:00+0200"
+    ) -> SdmxData:
+        eurostat = FakeEurostat()
+        eurostat.add_dataset(
+            "ds", {'geo': geos, 'time': TIMES}, observations, updated
+        )
+        params = {} if time_filter is None else {'c[TIME_PERIOD]': time_filter}
+        return SdmxData(eurostat.sdmx_json("ds", params), "-")
+
+
+class MergeTest(SdmxDataTestCase):
+
+    def setUp(self):
+        self.observations = {
+            (geo, time): (float(g * 10 + t), "p" if t == 2 else "")
+            for g, geo in enumerate(GEOS)
+            for t, time in enumerate(TIMES[:3])
+            if (g, t) != (2, 1)
+        }
+
+    def test_merge_equals_full_data(self):
+        old = self.data(self.observations)
+        new_observations = {
+            **self.observations,
+            ("BE", "2023"): (5.0, "e"),
+            ("FR", "2023"): (None, "c")
+        }
+        new = self.data(
+            new_observations, "ge:2022", updated="2024-06-01T10:00:00+0200"
+        )
+        merged = old.merge(new, "2022")
+        full = self.data(new_observations, updated="2024-06-01T10:00:00+0200")
+        self.assertEqual(records(merged), records(full))
+        self.assertEqual(merged.updated, full.updated)
+        self.assertEqual(list(merged.periods), list(full.periods))
+        self.assertEqual(
+            merged.get_latest_time_value_with(0.5, {}),
+            full.get_latest_time_value_with(0.5, {})
+        )
+
+    def test_merge_adds_new_dimension_values(self):
+        old = self.data(self.observations)
+        new = self.data(
+            {**self.observations, ("NL", "2023"): 7.0},
+            "ge:2022",
+            geos=GEOS + ["NL"]
+        )
+        merged = old.merge(new, "2022")
+        self.assertEqual(
+            merged.get_observation({'geo': "NL", 'time': "2023"}),
+            (SdmxData.NO_STATUS, 7.0)
+        )
+        self.assertEqual(
+            merged.get_observation({'geo': "BE", 'time': "2020"}),
+            (SdmxData.NO_STATUS, 0.0)
+        )
+        self.assertIn("NL", merged.dimension_value_labels['geo'])
+
+    def test_has_same_values_at(self):
+        old = self.data(self.observations)
+        same = self.data(self.observations, "ge:2022")
+        self.assertTrue(old.has_same_values_at(same, "2022"))
+        for changed in ((1.5, "p"), (20.0, ""), (None, "p")):
+            with self.subTest(changed=changed):
+                revised = self.data(
+                    {**self.observations, ("BE", "2022"): changed}, "ge:2022"
+                )
+                self.assertFalse(old.has_same_values_at(revised, "2022"))
+        # Only the given period is compared
+        revised = self.data({**self.observations, ("BE", "2021"): 1.5})
+        self.assertTrue(old.has_same_values_at(revised, "2022"))
+
+
+class SdmxCubeTest(SdmxDataTestCase):
+
+    def setUp(self):
+        # Missing observations and observations that only have a status
+        eurostat = FakeEurostat()
+        eurostat.add_dataset(
+            "ds",
+            {'unit': UNITS, 'geo': GEOS, 'time': TIMES},
+            {
+                (unit, geo, time): (
+                    None if (u + t) % 5 == 0 else float(100 * u + 10 * g + t),
+                    "p" if t == 3 else ("c" if (u + t) % 5 == 0 else "")
+                )
+                for u, unit in enumerate(UNITS)
+                for g, geo in enumerate(GEOS)
+                for t, time in enumerate(TIMES)
+                if (u + g + t) % 3
+            }
+        )
+        self.sdmx_data = SdmxData(eurostat.sdmx_json("ds"), "-")
+
+    def test_cells_match_get_observation(self):
+        for dense in (True, False):
+            cube = self.sdmx_data.to_cube(dense)
+            self.assertEqual(cube.is_dense, dense)
+            for unit, geo, time in itertools.product(
+                cube.values_of('unit'), cube.values_of('geo'),
+                cube.values_of('time')
+            ):
+                dimension_values = {'unit': unit, 'geo': geo, 'time': time}
+                with self.subTest(dense=dense, **dimension_values):
+                    observation, status = cube.sel(**dimension_values)
+                    expected = self.sdmx_data.get_observation(dimension_values)
+                    if expected is None:
+                        expected = (SdmxData.NO_STATUS, np.nan)
+                    self.assertEqual(status, expected[0])
+                    np.testing.assert_equal(observation, expected[1])
+
+    def test_dense_and_sparse_blocks_are_equal(self):
+        dense = self.sdmx_data.to_cube(dense=True)
+        sparse = self.sdmx_data.to_cube(dense=False)
+        for dimension_values in ({}, {'unit': "B"}, {'geo': "DE", 'time': "2021"}):
+            with self.subTest(**dimension_values):
+                dense_observations, dense_statuses = dense.sel(**dimension_values)
+                sparse_observations, sparse_statuses = sparse.sel(
+                    **dimension_values
+                )
+                np.testing.assert_array_equal(
+                    dense_observations, sparse_observations
+                )
+                np.testing.assert_array_equal(dense_statuses, sparse_statuses)
+        with self.assertRaises(KeyError):
+            sparse.sel(geo="NL")
+
+
+class SaveLoadTest(SdmxDataTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "ds.arrow")
+        self.sdmx_data = self.data({
+            (geo, time): (
+                None if (g, t) == (1, 1) else float(g * 10 + t) + 0.25,
+                "p" if t == 2 else ("c" if (g, t) == (1, 1) else "")
+            )
+            for g, geo in enumerate(GEOS)
+            for t, time in enumerate(TIMES)
+            if (g, t) != (2, 0)
+        })
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        compressions = [None] + [
+            compression for compression in ('lz4', 'zstd')
+            if pa.Codec.is_available(compression)
+        ]
+        for compression in compressions:
+            for memory_map in (True, False):
+                with self.subTest(compression=compression, memory_map=memory_map):
+                    self.sdmx_data.save(self.filename, compression)
+                    loaded = SdmxData.load(self.filename, memory_map)
+                    self.assert_same_data(loaded, self.sdmx_data)
+
+    def assert_same_data(self, loaded: SdmxData, original: SdmxData):
+        self.assertEqual(records(loaded), records(original))
+        for column_id in original.dimension_ids + ['status']:
+            self.assertEqual(loaded.dataframe[column_id].dtype, 'category')
+            self.assertEqual(
+                list(loaded.dataframe[column_id].cat.categories),
+                list(original.dataframe[column_id].cat.categories)
+            )
+        self.assertEqual(loaded.dataframe['observation'].dtype, np.float64)
+        np.testing.assert_array_equal(
+            loaded.dataframe['observation'].to_numpy(),
+            original.dataframe['observation'].to_numpy()
+        )
+        self.assertEqual(
+            loaded.get_observation({'geo': "DE", 'time': "2022"}),
+            original.get_observation({'geo': "DE", 'time': "2022"})
+        )
+        self.assertEqual(loaded.updated, original.updated)
+        self.assertEqual(loaded.language, original.language)
+        self.assertEqual(loaded.dimension_labels, original.dimension_labels)
+        self.assertEqual(
+            loaded.dimension_value_labels, original.dimension_value_labels
+        )
+        self.assertEqual(loaded.status_labels, original.status_labels)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import json
+import unittest
+from typing import Dict, List
+
+import numpy as np
+
+from lib.eurostat.eurostat_api.sdmx_json_stream import SdmxJsonStreamParser
+from tests.fake_eurostat import FakeEurostat
+
+
+def parse(chunks: List[bytes]) -> SdmxJsonStreamParser:
+    return SdmxJsonStreamParser().parse(chunks)
+
+
+def as_dict(ids: np.ndarray, values: np.ndarray) -> Dict[int, object]:
+    return dict(zip(ids.tolist(), values.tolist()))
+
+
+class SdmxJsonStreamParserTest(unittest.TestCase):
+
+    def setUp(self):
+        eurostat = FakeEurostat()
+        eurostat.add_dataset(
+            "ds",
+            {'geo': ["BE", "DE", "FR"], 'time': ["2021", "2022", "2023"]},
+            {
+                ("BE", "2021"): 1.5,
+                ("BE", "2022"): (-2e-3, "p"),
+                ("DE", "2021"): (None, "c"),
+                ("DE", "2023"): 1234567.0,
+                ("FR", "2022"): (0.0, "eé"),
+                ("FR", "2023"): (42.0, "p")
+            }
+        )
+        self.json_data = eurostat.sdmx_json("ds")
+        # Unusual but valid whitespace and escapes around the observations
+        self.document = json.dumps(
+            self.json_data, indent=1, ensure_ascii=False
+        ).replace('"p"', '"\\u0070"').encode('utf-8')
+
+    def assert_parsed(self, parser: SdmxJsonStreamParser):
+        self.assertEqual(
+            as_dict(*parser.values),
+            {int(key): value for key, value in self.json_data['value'].items()}
+        )
+        self.assertEqual(
+            as_dict(*parser.statuses),
+            {int(key): value for key, value in self.json_data['status'].items()}
+        )
+        self.assertEqual(
+            parser.json_data,
+            {**self.json_data, 'value': {}, 'status': {}}
+        )
+
+    def test_whole_document(self):
+        self.assert_parsed(parse([self.document]))
+
+    def test_every_chunk_boundary(self):
+        # Splits inside keys, numbers, escapes and multi-byte characters
+        for position in range(len(self.document) + 1):
+            with self.subTest(position=position):
+                self.assert_parsed(parse([
+                    self.document[:position], self.document[position:]
+                ]))
+
+    def test_single_byte_chunks(self):
+        self.assert_parsed(parse([
+            self.document[i:i + 1] for i in range(len(self.document))
+        ]))
+
+    def test_observations_as_array(self):
+        document = json.dumps({
+            **self.json_data, 'value': [1.0, None, 3.0], 'status': {}
+        }).encode('utf-8')
+        self.assertEqual(as_dict(*parse([document]).values), {0: 1.0, 2: 3.0})
+
+    def test_truncated_document_is_rejected(self):
+        with self.assertRaises(ValueError):
+            parse([self.document[:len(self.document) // 2]])
+
+
+if __name__ == '__main__':
+    unittest.main()